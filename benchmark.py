@@ -0,0 +1,583 @@
+#!/usr/bin/python3
+""" DIYHA Switch benchmarks
+    Drive the controllers with the simulated GPIO backend and the loopback broker
+    and report p50/p99 latency of the hot paths.  python3 benchmark.py --help
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+os.environ.setdefault("DIYHA_GPIO", "simulated")
+
+# pylint: disable=wrong-import-position
+import argparse
+import collections
+import queue
+import subprocess
+import tempfile
+import threading
+import time
+
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.historymodel import HistoryModel, HISTORY_SIZE
+from pkg_classes import metricsmodel
+from pkg_classes.factsmodel import FactsModel
+from pkg_classes.alarmcontroller import AlarmController
+from pkg_classes.loopbackbroker import LoopbackBroker, LoopbackMessage
+from pkg_classes.outboxmodel import OutboxModel
+from pkg_classes.publishcontroller import PublishController, REPLAY_BATCH, REPLAY_INTERVAL
+from pkg_classes.schedulercontroller import SchedulerController
+from pkg_classes.topicrouter import TopicRouter
+from pkg_classes.zonedispatch import switch_message, motion_message
+from pkg_classes.zonemodel import ZoneModel
+
+SWITCH_GPIO = 23
+MOTION_GPIO = 24
+ALARM_GPIO = 25
+
+POLL_INTERVAL = 0.5 # the sleep of the original polling main loop
+TIMEOUT = 5.0
+
+
+def percentile(samples, fraction):
+    """ Nearest rank percentile of a list of samples. """
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def report(name, samples):
+    """ One line of p50/p99/max in milliseconds. """
+    if not samples:
+        return "{0:34s} no samples".format(name)
+    return "{0:34s} n={1:<5d} p50={2:8.3f} ms  p99={3:8.3f} ms  max={4:8.3f} ms".format(
+        name, len(samples), percentile(samples, 0.50) * 1000.0,
+        percentile(samples, 0.99) * 1000.0, max(samples) * 1000.0)
+
+
+class Rig:
+    """ Wire a zone to a loopback broker the way switch.py does. """
+
+    def __init__(self, mode="motion", interval=300.0, **debounce):
+        """ Create a broker, a switch client, a zone and the alarm. """
+        self.broker = LoopbackBroker()
+        self.client = self.broker.client()
+        self.scheduler = SchedulerController()
+        self.scheduler.start()
+        self.zone = ZoneModel("diy/bench/room", SWITCH_GPIO, MOTION_GPIO, mode, interval,
+                              **debounce)
+        self.alarm = AlarmController(ALARM_GPIO)
+        self.alarm.start(self.scheduler)
+        self.zone.switch.set_mqtt_topic(self.client, self.zone.topic.get_switch())
+        self.router = TopicRouter()
+        self.router.add(self.zone.topic.get_switch(), switch_message(self.zone))
+        self.client.on_message = self.on_message
+        self.client.connect("loopback")
+        self.zone.switch.start(self.scheduler)
+        self.zone.motion.start(self.scheduler)
+        self.running = False
+
+    def on_message(self, client, userdata, msg):
+        """ switch.py dispatch """
+        # pylint: disable=unused-argument
+        self.router.dispatch(client, msg)
+
+    def event_loop(self, ):
+        """ Current main loop: block on the interrupt queue. """
+        while True:
+            movement = self.zone.motion.wait_for_motion()
+            if movement is None:
+                break
+            motion_message(self.zone, movement, self.client)
+
+    def poll_loop(self, ):
+        """ Original main loop: wake every POLL_INTERVAL and check the queue. """
+        while self.running:
+            time.sleep(POLL_INTERVAL)
+            if self.zone.motion.detected():
+                movement = self.zone.motion.get_motion()
+                if movement is None:
+                    break
+                motion_message(self.zone, movement, self.client)
+
+    def start(self, poll=False):
+        """ Run the main loop on its own thread. """
+        self.running = True
+        target = self.poll_loop if poll else self.event_loop
+        loop_thread = threading.Thread(target=target, args=())
+        loop_thread.daemon = True
+        loop_thread.start()
+
+    def stop(self, ):
+        """ Stop the main loop, timers and controllers. """
+        self.running = False
+        self.zone.motion.stop()
+        self.alarm.reset()
+        self.zone.switch.turn_off_switch()
+        self.scheduler.stop()
+        self.client.disconnect()
+
+
+def bench_motion(iterations, poll):
+    """ PIR edge to motion publish, and rising edge to relay on. """
+    rig = Rig()
+    published = queue.Queue()
+    relay = queue.Queue()
+    motion_topic = rig.zone.topic.get_motion()
+    rig.broker.listen(lambda msg, stamp: msg.topic == motion_topic and published.put(stamp))
+    GPIO.watch(SWITCH_GPIO, lambda pin, value, stamp: value == GPIO.HIGH and relay.put(stamp))
+    rig.start(poll)
+    to_publish = []
+    to_relay = []
+    for _ in range(iterations):
+        rising = GPIO.inject_edge(MOTION_GPIO, GPIO.HIGH)
+        to_publish.append(published.get(True, TIMEOUT) - rising)
+        to_relay.append(relay.get(True, TIMEOUT) - rising)
+        falling = GPIO.inject_edge(MOTION_GPIO, GPIO.LOW)
+        to_publish.append(published.get(True, TIMEOUT) - falling)
+        rig.zone.switch.turn_off_switch()
+    rig.stop()
+    return to_publish, to_relay
+
+
+def bench_command(iterations):
+    """ MQTT command publish to relay output. """
+    rig = Rig(mode="message")
+    hub = rig.broker.client()
+    hub.connect("loopback")
+    rig.client.subscribe(rig.zone.topic.get_switch(), 1)
+    accepted = queue.Queue()
+    relay = queue.Queue()
+    switch_topic = rig.zone.topic.get_switch()
+    rig.broker.listen(lambda msg, stamp: msg.topic == switch_topic and accepted.put(stamp))
+    GPIO.watch(SWITCH_GPIO, lambda pin, value, stamp: relay.put(stamp))
+    samples = []
+    for index in range(iterations):
+        hub.publish(switch_topic, "ON" if index % 2 == 0 else "OFF", 1, False)
+        sent = accepted.get(True, TIMEOUT)
+        samples.append(relay.get(True, TIMEOUT) - sent)
+        while not accepted.empty():  # the switch state publish
+            accepted.get(False)
+    rig.stop()
+    return samples
+
+
+def bench_rules(iterations, local):
+    """ message mode rising edge to relay on, by a local rule or a hub that
+        answers the motion publish with a switch command.
+    """
+    rig = Rig(mode="message")
+    if local:
+        rig.zone.rules.load('[{"on": "motion", "after": "00:00", "before": "23:59", "for": 60}]')
+    else:
+        hub = rig.broker.client()
+        hub.on_message = lambda client, userdata, msg: (
+            msg.payload == b'1' and client.publish(rig.zone.topic.get_switch(), "ON", 1, False))
+        hub.connect("loopback")
+        hub.subscribe(rig.zone.topic.get_motion(), 1)
+        rig.client.subscribe(rig.zone.topic.get_switch(), 1)
+    relay = queue.Queue()
+    published = queue.Queue()
+    motion_topic = rig.zone.topic.get_motion()
+    rig.broker.listen(lambda msg, stamp: msg.topic == motion_topic and published.put(stamp))
+    GPIO.watch(SWITCH_GPIO, lambda pin, value, stamp: value == GPIO.HIGH and relay.put(stamp))
+    rig.start()
+    samples = []
+    for _ in range(iterations):
+        rising = GPIO.inject_edge(MOTION_GPIO, GPIO.HIGH)
+        samples.append(relay.get(True, TIMEOUT) - rising)
+        published.get(True, TIMEOUT)
+        GPIO.inject_edge(MOTION_GPIO, GPIO.LOW)
+        published.get(True, TIMEOUT)
+        rig.zone.switch.turn_off_switch()
+    rig.stop()
+    return samples
+
+
+class TimedLock:
+    """ threading.Lock that records how long each holder kept it. """
+
+    def __init__(self, ):
+        """ Unlocked, nothing recorded. """
+        self.lock = threading.Lock()
+        self.since = 0.0
+        self.held = []
+
+    def acquire(self, ):
+        """ Take the lock and start the hold clock. """
+        self.lock.acquire()
+        self.since = time.perf_counter()
+
+    def release(self, ):
+        """ Record the hold and release. """
+        self.held.append(time.perf_counter() - self.since)
+        self.lock.release()
+
+    def __enter__(self, ):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class SlowClient:
+    """ A client whose publish takes latency seconds, like a congested broker link. """
+
+    def __init__(self, client, latency):
+        """ Wrap client. """
+        self.client = client
+        self.latency = latency
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """ Wait, then publish. """
+        time.sleep(self.latency)
+        return self.client.publish(topic, payload, qos, retain)
+
+
+def bench_contention(iterations, latency):
+    """ Switch lock hold times while MQTT commands, motion edges and auto-off
+        race on one switch whose state publishes take latency seconds.
+    """
+    rig = Rig(interval=0.002)
+    rig.zone.switch.lock = TimedLock()
+    rig.zone.switch.set_mqtt_topic(SlowClient(rig.client, latency), rig.zone.topic.get_switch())
+    hub = rig.broker.client()
+    hub.connect("loopback")
+    rig.client.subscribe(rig.zone.topic.get_switch(), 1)
+    rig.start()
+
+    def commands():
+        for index in range(iterations):
+            hub.publish(rig.zone.topic.get_switch(), "ON" if index % 2 == 0 else "OFF", 1, False)
+            time.sleep(0.001)
+
+    command_thread = threading.Thread(target=commands, args=())
+    command_thread.start()
+    for index in range(iterations):
+        GPIO.inject_edge(MOTION_GPIO, GPIO.HIGH if index % 2 == 0 else GPIO.LOW)
+        time.sleep(0.001)
+    command_thread.join()
+    rig.stop()
+    return rig.zone.switch.lock.held
+
+
+def bench_auto_off(iterations, interval):
+    """ Distance between the relay off write and last_motion + interval. """
+    rig = Rig(interval=interval)
+    relay = queue.Queue()
+    GPIO.watch(SWITCH_GPIO, lambda pin, value, stamp: value == GPIO.LOW and relay.put(stamp))
+    samples = []
+    for _ in range(iterations):
+        rig.zone.switch.turn_on_switch()
+        expected = rig.zone.switch.last_motion + interval
+        samples.append(abs(relay.get(True, TIMEOUT + interval) - expected))
+    rig.stop()
+    return samples
+
+
+def bench_alarm(iterations):
+    """ sound_pulsing_alarm(True) to the first alarm pin HIGH. """
+    rig = Rig()
+    relay = queue.Queue()
+    GPIO.watch(ALARM_GPIO, lambda pin, value, stamp: value == GPIO.HIGH and relay.put(stamp))
+    samples = []
+    for _ in range(iterations):
+        start = time.monotonic()
+        rig.alarm.sound_pulsing_alarm(True)
+        samples.append(relay.get(True, TIMEOUT) - start)
+        rig.alarm.sound_pulsing_alarm(False)
+    rig.stop()
+    return samples
+
+
+def bench_cadence(cycles, pattern=(0.01, 0.01, 0.01, 0.01, 0.01, 0.03)):
+    """ Alarm pin transitions of a fast temporal-3 shaped cadence against their
+        ideal times from the first pulse, read from the simulated GPIO clock.
+    """
+    rig = Rig()
+    stamps = queue.Queue()
+    GPIO.watch(ALARM_GPIO, lambda pin, value, stamp: stamps.put(stamp))
+    start = time.monotonic()
+    rig.alarm.play(pattern)
+    first = stamps.get(True, TIMEOUT)
+    started = first - start
+    samples = []
+    expected = first
+    for step in range(cycles * len(pattern)):
+        expected += pattern[step % len(pattern)]
+        samples.append(abs(stamps.get(True, TIMEOUT) - expected))
+    rig.alarm.silence()
+    rig.stop()
+    return started, samples
+
+
+def bench_debounce(iterations, chatter=10):
+    """ Noisy PIR bursts through the debounce stage: publishes per burst and
+        first edge to publish latency of the debounced reading.
+    """
+    rig = Rig(fall_hold=0.02, max_rate=20.0)
+    published = queue.Queue()
+    motion_topic = rig.zone.topic.get_motion()
+    rig.broker.listen(lambda msg, stamp: msg.topic == motion_topic and published.put(stamp))
+    rig.start()
+    samples = []
+    for _ in range(iterations):
+        first = GPIO.inject_edge(MOTION_GPIO, GPIO.HIGH)
+        for index in range(chatter):
+            GPIO.inject_edge(MOTION_GPIO, GPIO.LOW if index % 2 == 0 else GPIO.HIGH)
+        samples.append(published.get(True, TIMEOUT) - first)
+        GPIO.inject_edge(MOTION_GPIO, GPIO.LOW)
+        published.get(True, TIMEOUT)
+        time.sleep(0.05)
+    counters = rig.zone.motion.get_counters()
+    rig.stop()
+    return samples, counters
+
+
+def bench_publisher(bursts, window=0.02):
+    """ Publisher savings on a redundant stream: status values that rarely change,
+        a switch state republished on every motion and bursts of motion readings.
+    """
+    broker = LoopbackBroker()
+    client = broker.client()
+    client.connect("loopback")
+    scheduler = SchedulerController()
+    scheduler.start()
+    publisher = PublishController(client, window)
+    publisher.start(scheduler)
+    for index in range(bursts):
+        publisher.publish("diy/bench/cpu", "{0:.1f}".format(12.5 + index // 50), 0, True)
+        publisher.publish("diy/bench/disk", "3.1", 0, True)
+        publisher.publish("diy/bench/room/switch", "ON", 0, True)
+        for reading in ("1", "0", "1", "0", "1"):
+            publisher.publish("diy/bench/room/motion", reading, 0, True)
+        time.sleep(window / 4)
+    time.sleep(window * 2)
+    scheduler.stop()
+    client.disconnect()
+    return publisher.get_counters()
+
+
+def bench_facts(iterations):
+    """ Startup path system facts: direct reads against the cat and hostname
+        subprocesses StatusModel used to spawn.
+    """
+    direct = []
+    spawned = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        facts = FactsModel()
+        facts.get_os_version()
+        facts.get_pi_version()
+        facts.get_ip_address()
+        direct.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        for command in ('cat /etc/os-release', 'cat /proc/device-tree/model'):
+            subprocess.run(command, shell=True, stdout=subprocess.PIPE,
+                           stderr=subprocess.DEVNULL, check=False)
+        subprocess.run(["hostname", "-I"], stdout=subprocess.PIPE, check=False)
+        spawned.append(time.perf_counter() - start)
+    return direct, spawned
+
+
+def outbox_rig(broker, scheduler, path):
+    """ A publisher with an outbox on a client wired the way switch.py does. """
+    client = broker.client()
+    publisher = PublishController(client, 0.0, OutboxModel(path))
+    publisher.start(scheduler)
+    client.on_connect = lambda *args: publisher.on_connect()
+    client.on_disconnect = lambda *args: publisher.on_disconnect()
+    return publisher, client
+
+
+def outage_publishes(publisher, events, topics):
+    """ Retained motion readings with every 16th publish an unretained event;
+        returns what the replay should deliver, in order: every event, and the
+        last reading per topic in the place of its last publish.
+    """
+    expected = collections.OrderedDict()
+    for index in range(events):
+        if index % 16 == 0:
+            topic, payload, retain = "diy/bench/events", str(index), False
+            key = index
+        else:
+            topic = "diy/bench/zone" + str(index % topics) + "/motion"
+            payload, retain, key = str(index % 2), True, topic
+        publisher.publish(topic, payload, 0, retain)
+        expected.pop(key, None)
+        expected[key] = (topic, payload.encode('utf-8'))
+    return list(expected.values())
+
+
+def wait_for_replay(delivered, count):
+    """ Seconds until count publishes reach the broker; replay is rate limited. """
+    start = time.perf_counter()
+    deadline = start + TIMEOUT + count / REPLAY_BATCH * REPLAY_INTERVAL
+    while len(delivered) < count and time.perf_counter() < deadline:
+        time.sleep(0.0005)
+    return time.perf_counter() - start
+
+
+def bench_outbox(events, topics=8):
+    """ Publishes made during a broker outage go through on_disconnect to the
+        journal and are replayed on reconnect; then a process dies mid-outage and
+        a new one replays the journal it left. Journal and replay durations,
+        counters, and whether each replay delivered what it should in order.
+    """
+    broker = LoopbackBroker()
+    scheduler = SchedulerController()
+    scheduler.start()
+    delivered = []
+    broker.listen(lambda msg, stamp: delivered.append((msg.topic, msg.payload)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "outbox.journal")
+        publisher, client = outbox_rig(broker, scheduler, path)
+        client.connect("loopback")
+        broker.outage()
+        start = time.perf_counter()
+        expected = outage_publishes(publisher, events, topics)
+        journaled = time.perf_counter() - start
+        del delivered[:]
+        broker.restart()
+        replayed = wait_for_replay(delivered, len(expected))
+        reconnect = delivered == expected
+        counters = publisher.get_counters()
+        broker.outage()
+        expected = outage_publishes(publisher, events, topics)
+        client.on_connect = client.on_disconnect = None # the process is gone
+        broker.restart()
+        del delivered[:]
+        publisher, client = outbox_rig(broker, scheduler, path)
+        client.connect("loopback")
+        wait_for_replay(delivered, len(expected))
+        restart = delivered == expected
+    scheduler.stop()
+    return journaled, replayed, counters, {"reconnect": reconnect, "restart": restart}
+
+
+def bench_history(iterations):
+    """ Motion history queries over a full buffer of a day of readings. """
+    history = HistoryModel()
+    now = time.monotonic() + 86400.0 # times are stored signed so must stay positive
+    spacing = 86400.0 / HISTORY_SIZE
+    for index in range(HISTORY_SIZE):
+        history.record(index % 2 == 0, now - 86400.0 + index * spacing)
+    results = {}
+    for request in ({"query": "count", "window": 3600}, {"query": "duty", "window": 86400},
+                    {"query": "intervals", "n": 100}):
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            history.query(request, now)
+            samples.append(time.perf_counter() - start)
+        results[request["query"]] = samples
+    return results, history.changes.data.buffer_info()[1] * history.changes.data.itemsize
+
+
+def bench_router(messages):
+    """ Messages per second through the switch.py on_message router. """
+    def handler(client, msg):
+        # pylint: disable=unused-argument
+        pass
+    router = TopicRouter()
+    for topic in ("diy/system/fire", "diy/system/panic", "diy/system/test", "diy/system/who"):
+        router.add(topic, handler)
+    for index in range(4):
+        router.add("diy/zone" + str(index) + "/room/switch", handler)
+    router.add("diy/+/hub/#", handler)
+    results = []
+    for name, topic in (("exact", "diy/zone3/room/switch"),
+                        ("wildcard", "diy/main/hub/config/zone"),
+                        ("unrouted", "diy/main/unknown/topic")):
+        msg = LoopbackMessage(topic, "ON", 1, False)
+        start = time.perf_counter()
+        for _ in range(messages):
+            router.dispatch(None, msg)
+        elapsed = time.perf_counter() - start
+        results.append("{0:34s} {1:12,.0f} msg/s".format("router " + name, messages / elapsed))
+    return results
+
+
+def main():
+    """ Run the suite and print one line per measurement. """
+    parser = argparse.ArgumentParser('benchmark.py')
+    parser.add_argument('--iterations', type=int, default=200, help='samples per measurement')
+    parser.add_argument('--poll-iterations', type=int, default=10,
+                        help='samples for the original 0.5 s polling loop, 0 to skip')
+    parser.add_argument('--messages', type=int, default=200000,
+                        help='messages per router throughput measurement')
+    parser.add_argument('--interval', type=float, default=0.05,
+                        help='switch interval in seconds for the auto-off measurement')
+    args = parser.parse_args()
+    lines = []
+    to_publish, to_relay = bench_motion(args.iterations, poll=False)
+    lines.append(report("motion edge -> publish", to_publish))
+    lines.append(report("motion edge -> relay", to_relay))
+    if args.poll_iterations > 0:
+        to_publish, to_relay = bench_motion(args.poll_iterations, poll=True)
+        lines.append(report("motion edge -> publish (polling)", to_publish))
+        lines.append(report("motion edge -> relay (polling)", to_relay))
+    lines.append(report("mqtt command -> relay", bench_command(args.iterations)))
+    lines.append(report("motion -> relay (local rule)", bench_rules(args.iterations, True)))
+    lines.append(report("motion -> relay (hub round-trip)",
+                        bench_rules(args.iterations, False)))
+    for latency in (0.0, 0.002, 0.02):
+        lines.append(report("switch lock hold, publish {0:g} ms".format(latency * 1000.0),
+                            bench_contention(args.iterations, latency)))
+    lines.append(report("auto-off error", bench_auto_off(args.iterations, args.interval)))
+    lines.append(report("pulsing alarm -> first pulse", bench_alarm(args.iterations)))
+    started, samples = bench_cadence(args.iterations // 8 or 1)
+    lines.append(report("alarm cadence jitter", samples))
+    lines.append("{0:34s} {1:.3f} ms".format("alarm cadence -> first pulse", started * 1000.0))
+    samples, counters = bench_debounce(args.iterations // 4 or 1)
+    lines.append(report("chattering edge -> publish", samples))
+    lines.append("{0:34s} edges={1} events={2}".format(
+        "debounce counters", counters["edges"], counters["events"]))
+    direct, spawned = bench_facts(args.iterations // 4 or 1)
+    lines.append(report("system facts (direct)", direct))
+    lines.append(report("system facts (subprocess)", spawned))
+    counters = bench_publisher(args.iterations)
+    lines.append("{0:34s} {1}".format("publisher", " ".join(
+        key + "=" + str(value) for key, value in counters.items())))
+    journaled, replayed, counters, ordered = bench_outbox(args.iterations * 10)
+    lines.append("{0:34s} journal={1:.1f} ms replay={2:.1f} ms {3}".format(
+        "outbox", journaled * 1000.0, replayed * 1000.0, " ".join(
+            key + "=" + str(counters[key]) for key in ("outboxed", "collapsed", "replayed"))))
+    lines.append("{0:34s} {1}".format("outbox replayed in order", " ".join(
+        key + "=" + str(value) for key, value in ordered.items())))
+    samples, size = bench_history(args.iterations // 4 or 1)
+    for name in samples:
+        lines.append(report("history " + name, samples[name]))
+    lines.append("{0:34s} {1} readings in {2} KB".format(
+        "history size", HISTORY_SIZE, size // 1024))
+    lines.extend(bench_router(args.messages))
+    for name, summary in metricsmodel.summary().items():
+        lines.append("{0:34s} {1}".format(name[:34], " ".join(
+            key + "=" + str(value) for key, value in summary.items())))
+    for line in lines:
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/python3
+""" DIYHA Switch fleet simulator
+    Run hundreds or thousands of simulated switches against a real broker and
+    report broker throughput, command latency and memory per switch.
+    python3 fleet.py --mqtt localhost --switches 500 --processes 4
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+os.environ.setdefault("DIYHA_GPIO", "simulated")
+
+# pylint: disable=wrong-import-position
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import queue
+import random
+import resource
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+from pkg_classes.asynciohelper import AsyncioHelper
+from pkg_classes.failovercontroller import FailoverController, parse_broker
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.historymodel import HISTORY_SIZE
+from pkg_classes.publishcontroller import PublishController
+from pkg_classes.schedulercontroller import AsyncSchedulerController
+from pkg_classes.statusmodel import StatusModel
+from pkg_classes.topicrouter import TopicRouter
+from pkg_classes.zonemodel import ZoneModel
+from pkg_classes.zonedispatch import rule_message, drain_motion
+
+PIN_BASE = 1000 # simulated pins are only dictionary keys, two per switch
+MOTION_HOLD = 2.0 # seconds a simulated PIR stays high
+CONNECT_TIMEOUT = 60.0
+FLEET_TOPIC = "diy/sim"
+COMMAND = "/command" # rule trigger under each switch location the hub publishes to
+
+# Motion profiles: segments of seconds:motion starts per minute, repeated
+
+PROFILES = {
+    "quiet": "3600:0.2",
+    "home": "3600:1",
+    "office": "3600:4",
+    "burst": "60:30,240:1",
+}
+
+
+def parse_profile(text):
+    """ A PROFILES name or seconds:rate segments such as 60:30,240:1. """
+    text = PROFILES.get(text, text)
+    segments = []
+    for segment in text.split(","):
+        seconds, _, rate = segment.partition(":")
+        segments.append((float(seconds), float(rate)))
+    if not segments or min(seconds for seconds, _ in segments) <= 0.0:
+        raise ValueError("profile needs positive segment lengths: " + text)
+    return segments
+
+
+def rate_at(profile, elapsed):
+    """ Motion starts per second at elapsed seconds into the run, and the
+        seconds left in that segment.
+    """
+    cycle = sum(seconds for seconds, _ in profile)
+    offset = elapsed % cycle
+    for seconds, rate in profile:
+        if offset < seconds:
+            return rate / 60.0, seconds - offset
+        offset -= seconds
+    return profile[-1][1] / 60.0, cycle
+
+
+def resident_kb():
+    """ VmRSS of this process in KB. """
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class SimulatedSwitch:
+    """ One switch.py instance on a shared event loop: a zone with its switch
+        and PIR, a publisher, a status model and a paho client.
+    """
+
+    def __init__(self, index, loop, scheduler, args):
+        """ Build the controllers as switch.py does, on pins of its own. """
+        self.name = "sim{0:05d}".format(index)
+        self.loop = loop
+        self.scheduler = scheduler
+        self.zone = ZoneModel(FLEET_TOPIC + "/" + self.name, PIN_BASE + 2 * index,
+                              PIN_BASE + 2 * index + 1, args.mode, args.interval,
+                              history=args.history)
+        self.client = mqtt.Client(client_id=self.name)
+        self.client.on_connect = self.on_connect
+        self.client.on_disconnect = self.on_disconnect
+        self.client.on_message = self.on_message
+        self.publisher = PublishController(self.client)
+        self.publisher.start(scheduler)
+        self.zone.switch.set_mqtt_topic(self.publisher, self.zone.topic.get_switch())
+        self.status = StatusModel(self.publisher, args.sample_interval, host=self.name)
+        # the hub drives each switch through a zone rule, as on a real device
+        command = self.zone.get_location() + COMMAND
+        self.zone.rules.load(json.dumps([{"on": command, "payload": "ON", "action": "on"},
+                                         {"on": command, "payload": "OFF", "action": "off"}]))
+        self.router = TopicRouter()
+        for topic in self.zone.rules.get_topics():
+            self.router.add(topic, rule_message([self.zone]))
+        self.failover = FailoverController(args.mqtt.split(","), args.keepalive)
+        self.helper = AsyncioHelper(loop, self.client, self.failover)
+        self.zone.motion.start(scheduler)
+        self.zone.motion.set_listener(
+            lambda: loop.call_soon_threadsafe(drain_motion, self.zone, self.publisher))
+        self.connected = False
+        self.started = False
+        self.profile = None
+        self.origin = 0.0
+        self.timer = None
+
+    def on_connect(self, client, userdata, flags, rc_msg):
+        """ switch.py on_connect for one zone. """
+        # pylint: disable=unused-argument
+        if rc_msg != 0:
+            return
+        self.failover.on_connect()
+        self.publisher.on_connect()
+        for topic in self.zone.rules.get_topics():
+            client.subscribe(topic, 1)
+        self.connected = True
+        if not self.started:
+            self.started = True
+            self.status.start(self.scheduler)
+            self.zone.switch.start(self.scheduler)
+
+    def on_disconnect(self, client, userdata, rc_msg):
+        """ switch.py on_disconnect. """
+        # pylint: disable=unused-argument
+        self.connected = False
+        self.publisher.on_disconnect()
+        if rc_msg != 0:
+            self.failover.on_disconnect(client)
+
+    def on_message(self, client, userdata, msg):
+        """ switch.py dispatch. """
+        # pylint: disable=unused-argument
+        self.router.dispatch(client, msg)
+
+    def play(self, profile):
+        """ Start injecting PIR edges following the profile. """
+        self.profile = profile
+        self.origin = self.loop.time()
+        self.next_motion()
+
+    def next_motion(self, ):
+        """ Schedule the next rising edge, a Poisson process at the current rate. """
+        rate, left = rate_at(self.profile, self.loop.time() - self.origin)
+        if rate <= 0.0:
+            self.timer = self.loop.call_later(left, self.next_motion)
+            return
+        delay = random.expovariate(rate)
+        if delay > left:
+            # the rate changes first, draw again from the next segment
+            self.timer = self.loop.call_later(left, self.next_motion)
+            return
+        self.timer = self.loop.call_later(delay, self.motion)
+
+    def motion(self, ):
+        """ PIR high for MOTION_HOLD seconds. """
+        GPIO.inject_edge(self.zone.motion.pir_pin, GPIO.HIGH)
+        self.loop.call_later(MOTION_HOLD, GPIO.inject_edge, self.zone.motion.pir_pin, GPIO.LOW)
+        self.next_motion()
+
+    def stop(self, ):
+        """ Stop the profile and the timers. """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.status.stop()
+        self.zone.motion.set_listener(None)
+        self.zone.motion.stop()
+
+
+async def session(switches, baseline, args, go, results):
+    """ Connect every switch, report ready, run the profile, report counters. """
+    for switch in switches:
+        switch.helper.start()
+        await asyncio.sleep(1.0 / args.connect_rate)
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while not all(switch.connected for switch in switches) and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    connected = sum(1 for switch in switches if switch.connected)
+    results.put(("ready", connected, resident_kb() - baseline))
+    while not go.is_set():
+        await asyncio.sleep(0.05)
+    profile = parse_profile(args.profile)
+    for switch in switches:
+        switch.play(profile)
+    published = sum(switch.publisher.get_counters()["published"] for switch in switches)
+    start = time.monotonic()
+    await asyncio.sleep(args.duration)
+    elapsed = time.monotonic() - start
+    for switch in switches:
+        switch.stop()
+    published = sum(switch.publisher.get_counters()["published"]
+                    for switch in switches) - published
+    edges = sum(switch.zone.motion.get_counters()["events"] for switch in switches)
+    results.put(("report", published, elapsed, edges))
+    for switch in switches:
+        switch.client.disconnect()
+    for switch in switches:
+        await switch.helper.stop()
+
+
+def worker(first, count, args, go, results):
+    """ One process: count switches on one event loop. """
+    logging.basicConfig(level=logging.ERROR)
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    # one socket per switch
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    loop = asyncio.new_event_loop()
+    scheduler = AsyncSchedulerController(loop)
+    baseline = resident_kb()
+    switches = [SimulatedSwitch(index, loop, scheduler, args)
+                for index in range(first, first + count)]
+    loop.run_until_complete(session(switches, baseline, args, go, results))
+    loop.close()
+
+
+class Hub:
+    """ Sends switch commands to random switches and times the state reply.
+        Commands go out on one client to each switch's rule topic; another,
+        subscribed to the whole fleet, counts every message the broker delivers
+        and closes a round trip on the switch's next state publish.
+    """
+
+    def __init__(self, broker, names):
+        """ Connect the sender and the listener. """
+        host, port = parse_broker(broker)
+        self.names = names
+        self.lock = threading.Lock()
+        self.received = 0
+        self.pending = {} # switch topic -> command send time
+        self.state = {} # topic -> last switch payload seen
+        self.samples = []
+        self.sender = mqtt.Client(client_id="fleet-send-{0}".format(os.getpid()))
+        self.listener = mqtt.Client(client_id="fleet-listen-{0}".format(os.getpid()))
+        self.listener.on_message = self.on_message
+        subscribed = threading.Event()
+        self.listener.on_subscribe = lambda client, userdata, mid, qos: subscribed.set()
+        for client in (self.sender, self.listener):
+            client.connect(host, port, 60)
+            client.loop_start()
+        self.listener.subscribe(FLEET_TOPIC + "/#", 0)
+        subscribed.wait(CONNECT_TIMEOUT)
+
+    def on_message(self, client, userdata, msg):
+        """ Count deliveries and close out command round trips. """
+        # pylint: disable=unused-argument
+        now = time.monotonic()
+        with self.lock:
+            if msg.topic.endswith("/switch"):
+                # retained states from an earlier run included
+                self.state[msg.topic] = msg.payload
+            if msg.retain:
+                return
+            self.received += 1
+            sent = self.pending.pop(msg.topic, None)
+            if sent is not None:
+                self.samples.append(now - sent)
+
+    def command(self, ):
+        """ Toggle a random idle switch; False when it was still busy. """
+        location = FLEET_TOPIC + "/" + random.choice(self.names)
+        topic = location + "/switch"
+        with self.lock:
+            if topic in self.pending:
+                return False
+            payload = "OFF" if self.state.get(topic) == b'ON' else "ON"
+            self.pending[topic] = time.monotonic()
+        self.sender.publish(location + COMMAND, payload, 1, False)
+        return True
+
+    def run(self, rate, duration):
+        """ Commands at rate per second for duration seconds. """
+        start = time.monotonic()
+        received = self.received
+        sent = 0
+        while time.monotonic() - start < duration:
+            if rate > 0:
+                if self.command():
+                    sent += 1
+                time.sleep(1.0 / rate)
+            else:
+                time.sleep(0.1)
+        elapsed = time.monotonic() - start
+        return sent, (self.received - received) / elapsed
+
+    def stop(self, ):
+        """ Disconnect both clients. """
+        for client in (self.sender, self.listener):
+            client.disconnect()
+            client.loop_stop()
+
+
+def percentile(samples, fraction):
+    """ Nearest rank percentile of samples. """
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))]
+
+
+def main():
+    """ Start the worker processes, drive commands and print the report. """
+    parser = argparse.ArgumentParser('fleet.py')
+    parser.add_argument('--mqtt', default='localhost', help='MQTT broker host[:port]')
+    parser.add_argument('--switches', type=int, default=100, help='simulated switches')
+    parser.add_argument('--processes', type=int, default=1, help='worker processes')
+    parser.add_argument('--profile', default='home',
+                        help='motion profile: ' + ", ".join(PROFILES) +
+                        ' or seconds:starts-per-minute segments such as 60:30,240:1')
+    parser.add_argument('--mode', default='message', choices=['message', 'motion'],
+                        help='switch mode; in motion mode motion also answers commands, '
+                             'which blurs the command latency')
+    parser.add_argument('--interval', type=float, default=3600.0,
+                        help='switch auto-off seconds')
+    parser.add_argument('--sample-interval', type=float, default=60.0,
+                        help='status sample seconds per switch')
+    parser.add_argument('--history', type=int, default=HISTORY_SIZE,
+                        help='motion readings kept per switch, 8 bytes each')
+    parser.add_argument('--keepalive', type=int, default=60, help='MQTT keepalive seconds')
+    parser.add_argument('--commands', type=float, default=20.0,
+                        help='hub switch commands per second')
+    parser.add_argument('--connect-rate', type=float, default=200.0,
+                        help='new connections per second per process')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run')
+    args = parser.parse_args()
+    parse_profile(args.profile)
+
+    # spawn so each worker builds its own simulated GPIO and dispatch thread
+    context = multiprocessing.get_context("spawn")
+    go = context.Event()
+    results = context.Queue()
+    processes = []
+    per_process = -(-args.switches // args.processes)
+    for first in range(0, args.switches, per_process):
+        count = min(per_process, args.switches - first)
+        process = context.Process(target=worker,
+                                  args=(first, count, args, go, results))
+        process.start()
+        processes.append(process)
+
+    connected = 0
+    memory = 0
+    for _ in processes:
+        _, ready, grown = results.get(True, CONNECT_TIMEOUT * 2)
+        connected += ready
+        memory += grown
+    names = ["sim{0:05d}".format(index) for index in range(args.switches)]
+    hub = Hub(args.mqtt.split(",")[0], names)
+    go.set()
+    sent, delivered = hub.run(args.commands, args.duration)
+    published = 0
+    edges = 0
+    elapsed = args.duration
+    for _ in processes:
+        try:
+            _, count, elapsed, motion = results.get(True, args.duration + CONNECT_TIMEOUT)
+        except queue.Empty:
+            break
+        published += count
+        edges += motion
+    hub.stop()
+    for process in processes:
+        process.join()
+
+    print("{0:34s} {1} of {2} in {3} processes".format(
+        "switches connected", connected, args.switches, len(processes)))
+    print("{0:34s} {1:.1f} KB".format("memory per switch", memory / max(1, connected)))
+    print("{0:34s} {1} readings".format("motion", edges))
+    print("{0:34s} {1:,.0f} msg/s".format("published by switches", published / elapsed))
+    print("{0:34s} {1:,.0f} msg/s".format("delivered to hub", delivered))
+    if hub.samples:
+        print("{0:34s} n={1:<5d} p50={2:8.3f} ms  p99={3:8.3f} ms  max={4:8.3f} ms".format(
+            "command -> state publish", len(hub.samples),
+            percentile(hub.samples, 0.5) * 1000.0, percentile(hub.samples, 0.99) * 1000.0,
+            max(hub.samples) * 1000.0))
+    print("{0:34s} {1} sent, {2} answered".format("commands", sent, len(hub.samples)))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,8 @@
 #
 # import required Python3 libraries
 
-echo "Install Mqtt and RPI.GPIO"
+echo "Install Mqtt, RPI.GPIO and psutil"
 sudo pip3 install paho-mqtt
 sudo pip3 install RPI.GPIO
+sudo pip3 install psutil
 echo "Done -------------"
@@ -1,7 +1,7 @@
 #!/usr/bin/python3
 
 """ DIYHA Alarm Controller:
-    Manage a simple digital high or low GPIO pin.
+    Manage a simple digital high or low GPIO pin, steady or in a cadence.
 """
 
 # The MIT License (MIT)
@@ -26,57 +26,150 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from threading import Thread
-from time import sleep
-import RPi.GPIO as GPIO
+import threading
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.statefilemodel import ALARM
+
+PULSE_ON = 2.0 # seconds the pulsing alarm stays on
+SILENT = 0
+FIRE = 1
+PANIC = 2
+
+# Cadences as seconds on, off, on, off ... repeated; empty stays on.
+# temporal3 is the ANSI S3.41 fire evacuation signal, temporal4 the CO signal.
+
+PATTERNS = {
+    "steady": (),
+    "pulse": (PULSE_ON, 2.0),
+    "temporal3": (0.5, 0.5, 0.5, 0.5, 0.5, 1.5),
+    "temporal4": (0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 5.0),
+}
+
+
+def parse_pattern(text):
+    """ A PATTERNS name or comma separated on,off seconds such as 0.2,0.2,0.2,1. """
+    if text in PATTERNS:
+        return PATTERNS[text]
+    steps = tuple(float(step) for step in text.split(","))
+    if len(steps) % 2 != 0 or min(steps) <= 0.0:
+        raise ValueError("pattern needs positive on,off pairs: " + text)
+    return steps
+
 
 class AlarmController:
     """ Abstract and manage an alarm GPIO pin. """
 
-    def __init__(self, pin, interval=2):
-        """ Initialize the alarm GPIO pin. """
+    def __init__(self, pin, interval=2, saved=None):
+        """ Initialize the alarm GPIO pin. Fire sounds steady and panic pulses
+            PULSE_ON seconds on and interval off until set_patterns(). An alarm
+            the saved state file has sounding is set up on and resumes at start().
+        """
         self.alarm_pin = pin
+        self.saved = saved
+        restored = saved.restore(ALARM, pin) if saved is not None else None
+        self.sounding = restored[0] if restored is not None else SILENT
         GPIO.setmode(GPIO.BCM)  # Broadcom pin-numbering scheme
-        GPIO.setup(self.alarm_pin, GPIO.OUT)  # LED pin set as output
-        GPIO.output(self.alarm_pin, GPIO.LOW)
+        GPIO.setup(self.alarm_pin, GPIO.OUT,  # LED pin set as output
+                   initial=GPIO.LOW if self.sounding == SILENT else GPIO.HIGH)
         self.active = False
-        self.pulsing = False
-        self.interval = interval
+        self.fire = PATTERNS["steady"]
+        self.panic = (PULSE_ON, interval)
+        self.pattern = None # playing cadence, None when silent
+        self.step = 0
+        self.lock = threading.Lock()
+        self.scheduler = None
+        self.timer = None
+        self.deadline = 0.0
 
-    def start(self):
-        """ Start the alarm thread """
+    def set_patterns(self, fire, panic):
+        """ Cadences for sound_alarm and sound_pulsing_alarm """
+        self.fire = fire
+        self.panic = panic
+
+    def start(self, scheduler):
+        """ Register cadence steps with the shared scheduler and resume a
+            restored alarm
+        """
+        self.scheduler = scheduler
         self.active = True
-        led_thread = Thread(target=self.manage_alarm, args=())
-        led_thread.daemon = True
-        led_thread.start()
-
-    def manage_alarm(self):
-        """ sleep and then flash the LED """
-        while self.active:
-            if self.pulsing:
+        if self.sounding == FIRE:
+            self.play(self.fire)
+        elif self.sounding == PANIC:
+            self.play(self.panic)
+
+    def save(self, sounding):
+        """ Record which alarm sounds in the state file """
+        self.sounding = sounding
+        if self.saved is not None:
+            self.saved.save(ALARM, self.alarm_pin, sounding)
+
+    def manage_alarm(self, ):
+        """ One scheduled step of the cadence. Deadlines accumulate from the start
+            so scheduling latency never adds up into drift.
+        """
+        with self.lock:
+            self.timer = None
+            if self.active and self.pattern:
+                self.play_step()
+
+    def play_step(self, ):
+        """ Drive the pin for the current step and set the next deadline, lock
+            must be held
+        """
+        GPIO.output(self.alarm_pin, GPIO.HIGH if self.step % 2 == 0 else GPIO.LOW)
+        self.deadline += self.pattern[self.step]
+        self.step = (self.step + 1) % len(self.pattern)
+        self.timer = self.scheduler.call_at(self.deadline, self.manage_alarm)
+
+    def cancel_pulse(self, ):
+        """ Drop the pending cadence step, lock must be held """
+        if self.timer is not None:
+            self.scheduler.cancel(self.timer)
+            self.timer = None
+
+    def play(self, pattern):
+        """ Sound a cadence from its first on step right away; the cadence already
+            playing carries on undisturbed.
+        """
+        with self.lock:
+            if pattern == self.pattern:
+                return
+            self.cancel_pulse()
+            self.pattern = pattern
+            self.step = 0
+            if not pattern or self.scheduler is None:
                 GPIO.output(self.alarm_pin, GPIO.HIGH)
-                sleep(2.0)
-                GPIO.output(self.alarm_pin, GPIO.LOW)
-            sleep(self.interval)
+                return
+            self.deadline = self.scheduler.now()
+            self.play_step()
+
+    def silence(self, ):
+        """ Stop any cadence and turn power off to the GPIO pin. """
+        with self.lock:
+            self.pattern = None
+            self.cancel_pulse()
+            GPIO.output(self.alarm_pin, GPIO.LOW)
 
     def sound_alarm(self, turn_on):
-        """ Turn on or off power to the GPIO pin. """
-        """ Pull down to activate the relay """
+        """ Fire: sound the fire cadence or silence the alarm. """
         if turn_on:
-            GPIO.output(self.alarm_pin, GPIO.HIGH)
+            self.play(self.fire)
+            self.save(FIRE)
         else:
-            GPIO.output(self.alarm_pin, GPIO.LOW)
+            self.silence()
+            self.save(SILENT)
 
     def sound_pulsing_alarm(self, turn_on):
-        """ Turn on or off power to the GPIO pin. """
-        """ Pull down to activate the relay """
+        """ Panic: sound the panic cadence or silence the alarm. """
         if turn_on:
-            self.pulsing = True
+            self.play(self.panic)
+            self.save(PANIC)
         else:
-            self.pulsing = False
-            GPIO.output(self.alarm_pin, GPIO.LOW)
+            self.silence()
+            self.save(SILENT)
 
     def reset(self, ):
-        """ Turn power off to the GPIO pin. """
-        self.pulsing = False
-        GPIO.output(self.alarm_pin, GPIO.LOW)
+        """ Turn power off to the GPIO pin at shutdown; the saved state is kept
+            for the next start.
+        """
+        self.silence()
@@ -28,7 +28,7 @@
 
 from threading import Thread
 from time import sleep
-import RPi.GPIO as GPIO
+from pkg_classes.gpiobackend import GPIO
 
 class AliveController:
     """ Abstract and manage an alive GPIO LED. """
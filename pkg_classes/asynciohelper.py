@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+""" DIYHA asyncio helper:
+    Run the paho MQTT client socket on an asyncio event loop instead of loop_start().
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import asyncio
+import logging
+import paho.mqtt.client as mqtt
+
+MISC_INTERVAL = 1.0 # paho keepalive and retry housekeeping, as in loop_forever()
+
+
+class AsyncioHelper:
+    """ Bridge paho socket callbacks to loop readers and writers. """
+
+    def __init__(self, loop, client, failover):
+        """ Install the socket callbacks on the client. """
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop
+        self.client = client
+        self.failover = failover
+        self.misc = None
+        self.client.on_socket_open = self.on_socket_open
+        self.client.on_socket_close = self.on_socket_close
+        self.client.on_socket_register_write = self.on_socket_register_write
+        self.client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def call_on_loop(self, callback, *args):
+        """ Run callback now on the loop thread; from the connect thread hand
+            it to the loop, the selector is not thread-safe.
+        """
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def add_reader(self, sock, client):
+        """ Watch the socket unless it was closed before the loop got to it. """
+        if sock.fileno() != -1:
+            self.loop.add_reader(sock, client.loop_read)
+
+    def add_writer(self, sock, client):
+        """ Flush paho output unless the socket was closed in the meantime. """
+        if sock.fileno() != -1:
+            self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_open(self, client, userdata, sock):
+        """ Read from the broker socket whenever it is readable. """
+        # pylint: disable=unused-argument
+        self.call_on_loop(self.add_reader, sock, client)
+
+    def on_socket_close(self, client, userdata, sock):
+        """ Stop watching a closed socket. """
+        # pylint: disable=unused-argument
+        self.call_on_loop(self.loop.remove_reader, sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        """ paho has queued output, flush it when the socket is writable. """
+        # pylint: disable=unused-argument
+        self.call_on_loop(self.add_writer, sock, client)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        """ Output flushed. """
+        # pylint: disable=unused-argument
+        self.call_on_loop(self.loop.remove_writer, sock)
+
+    def start(self, ):
+        """ Connect and keep connected from a loop task. """
+        self.misc = self.loop.create_task(self.misc_loop())
+
+    async def misc_loop(self, ):
+        """ Rank the brokers and connect, then keepalive pings and retries until
+            the link drops, then back off and try the same or the next broker.
+            Probes and connects block for up to their timeouts, so they run in
+            the loop's executor and timers and motion keep going meanwhile.
+        """
+        await self.loop.run_in_executor(None, self.failover.probe)
+        while True:
+            try:
+                await self.loop.run_in_executor(None, self.failover.connect, self.client)
+            except OSError as error:
+                self.logger.error("Connect failed: " + str(error))
+                await self.loop.run_in_executor(None, self.failover.on_connect_fail,
+                                                self.client)
+                await asyncio.sleep(self.failover.delay)
+                continue
+            while self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+                await asyncio.sleep(MISC_INTERVAL)
+            self.logger.info("Broker connection lost, reconnecting")
+            await asyncio.sleep(self.failover.delay)
+
+    async def stop(self, ):
+        """ Cancel the housekeeping task and let pending output flush. """
+        if self.misc is not None:
+            self.misc.cancel()
+            try:
+                await self.misc
+            except asyncio.CancelledError:
+                pass
+        await asyncio.sleep(0)
@@ -24,8 +24,23 @@
 # THE SOFTWARE.
 
 import argparse
+import configparser
 import logging
-import logging.config
+from pkg_classes.alarmcontroller import parse_pattern
+from pkg_classes.failovercontroller import KEEPALIVE
+from pkg_classes.historymodel import HISTORY_SIZE
+from pkg_classes.statusmodel import SAMPLE_INTERVAL
+from pkg_classes.whocontroller import WHO_SPREAD
+
+# Zone keys: (name in the zone file, keyword argument, type). location, mode,
+# interval and the debounce keys reload at runtime, the pins and history need a restart.
+
+ZONE_KEYS = (('location', 'location', str), ('switch', 'switch_pin', int),
+             ('motion', 'motion_pin', int), ('mode', 'mode', str),
+             ('interval', 'interval', float), ('rise_hold', 'rise_hold', float),
+             ('fall_hold', 'fall_hold', float), ('max_rate', 'max_rate', float),
+             ('history', 'history', int))
+MODES = ('motion', 'message')
 
 class ConfigModel:
     """ Command line arguement model which expects an MQTT broker hostname or IP address,
@@ -34,23 +49,92 @@ class ConfigModel:
 
     def __init__(self,):
         """ Parse the command line arguements """
-        logging.config.fileConfig(fname='/usr/local/switch/logging.ini',
-                                  disable_existing_loggers=False)
-        # Get the logger specified in the file
         self.logger = logging.getLogger(__name__)
         PARSER = argparse.ArgumentParser('switch.py parser')
-        PARSER.add_argument('--mqtt', help='MQTT server IP address')
+        PARSER.add_argument('--mqtt',
+                            help='MQTT server host[:port], comma separated brokers fail over')
         PARSER.add_argument('--location', help='Location topic required')
         PARSER.add_argument('--mode', help='Mode: motion or message required')
+        PARSER.add_argument('--rise-hold', type=float, default=0.0,
+                            help='Seconds motion must hold before it is reported')
+        PARSER.add_argument('--fall-hold', type=float, default=0.0,
+                            help='Seconds without motion before it is reported')
+        PARSER.add_argument('--max-rate', type=float, default=0.0,
+                            help='Most motion readings reported per second, 0 for no limit')
+        PARSER.add_argument('--coalesce', type=float, default=0.0,
+                            help='Seconds to merge bursts of publishes to one topic, 0 to send all')
+        PARSER.add_argument('--sample-interval', type=float, default=SAMPLE_INTERVAL,
+                            help='Seconds between status samples, summarized every 15 minutes')
+        PARSER.add_argument('--outbox', default='/usr/local/switch/outbox.journal',
+                            help='Journal for publishes made while the broker is down, "" for none')
+        PARSER.add_argument('--state', default='/usr/local/switch/state.bin',
+                            help='State file that carries switch and alarm state over a '
+                                 'restart, "" for none')
+        PARSER.add_argument('--latitude', type=float,
+                            help='Site latitude for sunrise and sunset rules')
+        PARSER.add_argument('--longitude', type=float,
+                            help='Site longitude for sunrise and sunset rules, east positive')
+        PARSER.add_argument('--history', type=int, default=HISTORY_SIZE,
+                            help='Motion readings kept per zone for history queries')
+        PARSER.add_argument('--metrics', default='',
+                            help='host:port to serve Prometheus /metrics, ":9100" for every interface')
+        PARSER.add_argument('--fire-pattern', default='temporal3',
+                            help='Fire alarm cadence: steady, pulse, temporal3, temporal4 '
+                                 'or on,off seconds such as 0.2,0.2,0.2,1')
+        PARSER.add_argument('--panic-pattern', default='pulse',
+                            help='Panic alarm cadence, as --fire-pattern')
+        PARSER.add_argument('--snapshot', choices=['off', 'json', 'cbor'], default='off',
+                            help='Also publish the whole device state as one message on '
+                                 'diy/<host>/snapshot')
+        PARSER.add_argument('--snapshot-interval', type=float, default=0.0,
+                            help='Seconds between snapshots, 0 to send on change')
+        PARSER.add_argument('--no-legacy-topics', action='store_true',
+                            help='With --snapshot, stop publishing the per-topic status, '
+                                 'switch and motion state')
+        PARSER.add_argument('--who-spread', type=float, default=WHO_SPREAD,
+                            help='Longest random delay in seconds before answering diy/system/who')
+        PARSER.add_argument('--zones', help='Zone file with one section per location, '
+                                            'reloaded when it changes')
+        PARSER.add_argument('--keepalive', type=int, default=KEEPALIVE,
+                            help='MQTT keepalive seconds, a lost broker is noticed in 1.5 keepalives')
+        PARSER.add_argument('--runtime', choices=['thread', 'asyncio'], default='thread',
+                            help='Runtime: thread (default) or asyncio single event loop')
         ARGS = PARSER.parse_args()
         # command line arguement for the MQTT broker hostname or IP
         if ARGS.mqtt == None:
             self.logger.error("Terminating> --mqtt not provided")
             exit() # manadatory
-        self.broker_ip = ARGS.mqtt
-        # command line arguement for the location topic
-        if ARGS.location == None:
-            self.logger.error("Terminating> --location not provided")
+        self.brokers = [broker.strip() for broker in ARGS.mqtt.split(',') if broker.strip()]
+        self.broker_ip = self.brokers[0]
+        self.keepalive = ARGS.keepalive
+        # motion sensor debounce, also the default for every zone
+        self.debounce = {'rise_hold': ARGS.rise_hold,
+                         'fall_hold': ARGS.fall_hold,
+                         'max_rate': ARGS.max_rate}
+        self.coalesce = ARGS.coalesce
+        self.sample_interval = ARGS.sample_interval
+        self.outbox = ARGS.outbox
+        self.state = ARGS.state
+        self.site = (ARGS.latitude, ARGS.longitude)
+        self.history = ARGS.history
+        self.metrics = ARGS.metrics
+        self.who_spread = ARGS.who_spread
+        self.snapshot = ARGS.snapshot
+        self.snapshot_interval = ARGS.snapshot_interval
+        self.legacy_topics = not ARGS.no_legacy_topics or ARGS.snapshot == 'off'
+        try:
+            self.patterns = (parse_pattern(ARGS.fire_pattern), parse_pattern(ARGS.panic_pattern))
+        except ValueError as error:
+            self.logger.error("Terminating> " + str(error))
+            exit()
+        # command line arguement for the location topic, or a file of zones
+        self.zones = []
+        self.zones_file = ARGS.zones
+        self.config_text = ''
+        if ARGS.zones != None:
+            self.zones = self.read_zones(ARGS.zones)
+        elif ARGS.location == None:
+            self.logger.error("Terminating> --location or --zones not provided")
             exit() # mandatory
         self.location = ARGS.location
         # command line argument for the mode - manual or motion - motion is the default
@@ -59,11 +143,115 @@ class ConfigModel:
         else:
             self.mode = ARGS.mode
         self.logger.info( "Mode> " + str( self.mode ) )
+        self.runtime = ARGS.runtime
+        self.logger.info( "Runtime> " + str( self.runtime ) )
+
+    def read_zones(self, file_name):
+        """ Parse a zone file; every section needs location, switch and motion keys.
+            mode, interval, rise_hold, fall_hold, max_rate and history are optional:
+
+            [garage]
+            location = diy/main/garage
+            switch = 23
+            motion = 24
+            mode = message
+            interval = 300
+            fall_hold = 30
+        """
+        parser = configparser.ConfigParser()
+        if not parser.read(file_name):
+            self.logger.error("Terminating> zone file not found: " + file_name)
+            exit()
+        zones = []
+        for name, section in self.parse_zones(parser).items():
+            try:
+                zone = {'name': name,
+                        'location': section['location'],
+                        'switch_pin': section['switch_pin'],
+                        'motion_pin': section['motion_pin'],
+                        'mode': section.get('mode', 'motion')}
+            except KeyError:
+                self.logger.error("Terminating> zone " + name + ": location, switch and "
+                                  "motion are required")
+                exit()
+            if 'interval' in section:
+                zone['interval'] = section['interval']
+            for key, default in self.debounce.items():
+                zone[key] = section.get(key, default)
+            zone['history'] = section.get('history', self.history)
+            zones.append(zone)
+            self.logger.info("Zone> " + name + " " + zone['location'])
+        if not zones:
+            self.logger.error("Terminating> no zones in " + file_name)
+            exit()
+        return zones
+
+    def parse_zones(self, parser, fatal=True):
+        """ Typed and checked keyword arguments per zone section, only the keys
+            given. A bad value terminates at startup and raises ValueError on reload.
+        """
+        zones = {}
+        for name in parser.sections():
+            section = parser[name]
+            try:
+                unknown = set(section) - set(key for key, _, _ in ZONE_KEYS)
+                if unknown:
+                    raise ValueError("unknown key " + ", ".join(sorted(unknown)))
+                zone = {}
+                for key, argument, kind in ZONE_KEYS:
+                    if key in section:
+                        zone[argument] = kind(section[key])
+                if zone.get('mode', 'motion') not in MODES:
+                    raise ValueError("mode must be motion or message")
+                if zone.get('interval', 1.0) <= 0:
+                    raise ValueError("interval must be positive")
+                if min(zone.get(key, 0.0) for key in self.debounce) < 0:
+                    raise ValueError("rise_hold, fall_hold and max_rate can not be negative")
+                if '+' in zone.get('location', '') or '#' in zone.get('location', ''):
+                    raise ValueError("location can not contain MQTT wildcards")
+            except ValueError as error:
+                if fatal:
+                    self.logger.error("Terminating> zone " + name + ": " + str(error))
+                    exit()
+                raise ValueError("zone " + name + ": " + str(error))
+            zones[name] = zone
+        return zones
+
+    def set_config_text(self, text):
+        """ Zone sections from the retained config topic, laid over the zone file;
+            only text that has been checked and applied is kept.
+        """
+        self.config_text = text
+
+    def read_config(self, text=None):
+        """ The zone file with the config topic laid over it, as keyword arguments
+            per zone name; raises ValueError when either does not parse. text is
+            a new config topic payload to check in place of the kept one.
+        """
+        if text is None:
+            text = self.config_text
+        parser = configparser.ConfigParser()
+        try:
+            if self.zones_file is not None:
+                with open(self.zones_file) as zones_file:
+                    parser.read_file(zones_file)
+            parser.read_string(text, 'config topic')
+        except (OSError, configparser.Error) as error:
+            raise ValueError(str(error))
+        return self.parse_zones(parser, fatal=False)
 
     def get_broker(self, ):
         """ MQTT BORKER hostname or IP address."""
         return self.broker_ip
 
+    def get_brokers(self, ):
+        """ Every MQTT broker host[:port] in preference order """
+        return self.brokers
+
+    def get_keepalive(self, ):
+        """ MQTT keepalive in seconds """
+        return self.keepalive
+
     def get_location(self, ):
         """ MQTT location topic for the device. """
         return self.location
@@ -71,3 +259,67 @@ class ConfigModel:
     def get_mode(self,):
         """ Mode of switch operation - motion activated or manual via MQTT message """
         return self.mode
+
+    def get_zones(self,):
+        """ Zone keyword arguments from the --zones file, empty for a single location """
+        return self.zones
+
+    def get_zones_file(self,):
+        """ Path of the --zones file, None for a single location """
+        return self.zones_file
+
+    def get_debounce(self,):
+        """ rise_hold, fall_hold and max_rate for a single location """
+        return self.debounce
+
+    def get_coalesce(self,):
+        """ Publish coalescing window in seconds """
+        return self.coalesce
+
+    def get_sample_interval(self,):
+        """ Status sample resolution in seconds """
+        return self.sample_interval
+
+    def get_outbox(self,):
+        """ Outbox journal path, empty to publish only while connected """
+        return self.outbox
+
+    def get_state(self,):
+        """ State file path, empty to start every switch and alarm off """
+        return self.state
+
+    def get_history(self,):
+        """ Motion readings kept per zone """
+        return self.history
+
+    def get_snapshot(self,):
+        """ off, json or cbor """
+        return self.snapshot
+
+    def get_snapshot_interval(self,):
+        """ Seconds between snapshots, 0 for on change """
+        return self.snapshot_interval
+
+    def get_legacy_topics(self,):
+        """ Publish the per-topic device state, always on without a snapshot """
+        return self.legacy_topics
+
+    def get_who_spread(self,):
+        """ Seconds over which who replies are spread """
+        return self.who_spread
+
+    def get_metrics(self,):
+        """ host:port of the Prometheus endpoint, empty when not served """
+        return self.metrics
+
+    def get_patterns(self,):
+        """ (fire, panic) alarm cadences as on,off seconds """
+        return self.patterns
+
+    def get_site(self,):
+        """ (latitude, longitude) for sunrise and sunset rules, None when not given """
+        return self.site
+
+    def get_runtime(self,):
+        """ thread: paho loop_start plus timer thread, asyncio: one event loop """
+        return self.runtime
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+""" DIYHA host facts read directly from procfs and the network interfaces """
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import socket
+import time
+
+OS_RELEASE = "/etc/os-release"
+DEVICE_MODEL = "/proc/device-tree/model"
+ADDRESS_CHECK = 5 * 60 # seconds before the interfaces are read again
+
+
+class FactsModel:
+    """ Facts that never change are read once, the IP address is rechecked at
+        most every address_check seconds.
+    """
+
+    def __init__(self, address_check=ADDRESS_CHECK):
+        ''' Nothing is read until a fact is asked for '''
+        self.cache = {}
+        self.ip_address = None
+        self.address_check = address_check
+        self.address_time = None
+
+    def cached(self, name, reader):
+        ''' read a static fact once for the life of the process '''
+        if name not in self.cache:
+            self.cache[name] = reader()
+        return self.cache[name]
+
+    def get_host(self, ):
+        ''' host name used in the diy/<host>/... topics '''
+        return self.cached( "host", socket.gethostname )
+
+    def get_os_version(self, ):
+        ''' VERSION from /etc/os-release, None when missing '''
+        return self.cached( "os", self.read_os_version )
+
+    def get_pi_version(self, ):
+        ''' model from the device tree, None when not running on a Pi '''
+        return self.cached( "pi", self.read_pi_version )
+
+    def read_os_version(self, ):
+        ''' parse VERSION="10 (buster)" '''
+        try:
+            with open( OS_RELEASE ) as release:
+                for line in release:
+                    key, _, value = line.rstrip( '\n' ).partition( '=' )
+                    if key == 'VERSION':
+                        return "Raspbian " + value.replace( '"', '' )
+        except OSError:
+            pass
+        return None
+
+    def read_pi_version(self, ):
+        ''' parse b"Raspberry Pi 3 Model B Rev 1.2\\x00" '''
+        try:
+            with open( DEVICE_MODEL, 'rb' ) as model:
+                data = model.read()
+        except OSError:
+            return None
+        _, found, value = data.partition( b' Pi ' )
+        if not found:
+            return None
+        return "Raspberry Pi " + str( value.split( b'\x00' )[0], 'utf-8' )
+
+    def read_ip_address(self, ):
+        ''' all global addresses, as hostname -I prints them '''
+        import psutil # deferred, only the status sampler needs it
+        addresses = []
+        for interface in psutil.net_if_addrs().values():
+            for address in interface:
+                if address.family not in ( socket.AF_INET, socket.AF_INET6 ):
+                    continue
+                ip = address.address.split( '%' )[0]
+                if ip.startswith( '127.' ) or ip == '::1' or ip.startswith( 'fe80:' ):
+                    continue
+                addresses.append( ip )
+        return " ".join( addresses )
+
+    def get_ip_address(self, ):
+        ''' the last address read '''
+        if self.ip_address is None:
+            self.ip_address = self.read_ip_address()
+            self.address_time = time.monotonic()
+        return self.ip_address
+
+    def ip_address_changed(self, ):
+        ''' reread the interfaces once the last read is stale and report whether
+            the addresses differ '''
+        now = time.monotonic()
+        if self.address_time is not None and now - self.address_time < self.address_check:
+            return False
+        self.address_time = now
+        current = self.read_ip_address()
+        if current == self.ip_address:
+            return False
+        self.ip_address = current
+        return True
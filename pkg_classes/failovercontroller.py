@@ -0,0 +1,145 @@
+#!/usr/bin/python3
+
+""" DIYHA Failover Controller:
+    Rank MQTT brokers by connect time and move between them with jittered
+    exponential backoff.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import random
+import socket
+import time
+
+MQTT_PORT = 1883
+KEEPALIVE = 15 # seconds, detects a dead broker in about 1.5 keepalives
+PROBE_TIMEOUT = 1.0
+MIN_BACKOFF = 0.5
+MAX_BACKOFF = 60.0
+
+
+def parse_broker(broker):
+    """ host or host:port """
+    host, _, port = broker.partition(':')
+    return host, int(port) if port else MQTT_PORT
+
+
+class FailoverController:
+    """ Pick the fastest healthy broker and fail over to the next when it is lost. """
+
+    def __init__(self, brokers, keepalive=KEEPALIVE,
+                 min_backoff=MIN_BACKOFF, max_backoff=MAX_BACKOFF):
+        """ brokers: list of host or host:port strings in preference order. """
+        self.logger = logging.getLogger(__name__)
+        self.brokers = [parse_broker(broker) for broker in brokers]
+        self.keepalive = keepalive
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.ranked = list(self.brokers)
+        self.index = 0
+        self.attempts = 0
+        self.delay = min_backoff
+        self.lost_at = None
+        self.failovers = 0
+        self.reconnects = 0
+        self.reconnect_seconds = 0.0
+
+    def probe(self, ):
+        """ Rank brokers by TCP connect time, unreachable ones last. """
+        if len(self.brokers) < 2:
+            return
+        timings = []
+        for position, broker in enumerate(self.brokers):
+            start = time.monotonic()
+            try:
+                socket.create_connection(broker, timeout=PROBE_TIMEOUT).close()
+                rtt = time.monotonic() - start
+            except OSError:
+                rtt = float('inf')
+            timings.append((rtt, position, broker))
+            self.logger.info("Broker> %s:%d rtt=%.1f ms", broker[0], broker[1], rtt * 1000.0)
+        self.ranked = [broker for _, _, broker in sorted(timings)]
+        self.index = 0
+
+    def current(self, ):
+        """ (host, port) of the broker to use now. """
+        return self.ranked[self.index]
+
+    def connect(self, client):
+        """ Blocking connect to the current broker, raises OSError on failure. """
+        host, port = self.current()
+        client.connect(host, port, self.keepalive)
+
+    def connect_async(self, client):
+        """ Point the paho loop thread at the current broker. """
+        host, port = self.current()
+        client.connect_async(host, port, self.keepalive)
+
+    def backoff(self, ):
+        """ Exponential backoff with equal jitter. """
+        ceiling = min(self.max_backoff, self.min_backoff * (2 ** self.attempts))
+        self.attempts += 1
+        self.delay = random.uniform(ceiling / 2.0, ceiling)
+        return self.delay
+
+    def on_connect(self, ):
+        """ CONNACK accepted: reset the backoff and record the outage length. """
+        self.attempts = 0
+        if self.lost_at is not None:
+            self.reconnects += 1
+            self.reconnect_seconds = time.monotonic() - self.lost_at
+            self.lost_at = None
+            host, port = self.current()
+            self.logger.info("Reconnected to %s:%d after %.2f s", host, port,
+                             self.reconnect_seconds)
+
+    def on_disconnect(self, client):
+        """ Connection lost: retry the same broker after a short jittered wait. """
+        if self.lost_at is None:
+            self.lost_at = time.monotonic()
+        delay = self.backoff()
+        client.reconnect_delay_set(delay, delay)
+
+    def on_connect_fail(self, client):
+        """ Attempt failed: move to the next ranked broker, re-ranking after a full cycle. """
+        if self.lost_at is None:
+            self.lost_at = time.monotonic()
+        previous = self.current()
+        self.index += 1
+        if self.index >= len(self.ranked):
+            self.probe()
+            self.index = 0
+        if self.current() != previous:
+            self.failovers += 1
+            self.logger.info("Failing over to %s:%d", *self.current())
+        self.connect_async(client)
+        delay = self.backoff()
+        client.reconnect_delay_set(delay, delay)
+
+    def get_counters(self, ):
+        """ Current broker, failovers, reconnects and the last time to reconnect. """
+        host, port = self.current()
+        return {"broker": host + ":" + str(port), "failovers": self.failovers,
+                "reconnects": self.reconnects,
+                "reconnect_seconds": round(self.reconnect_seconds, 2)}
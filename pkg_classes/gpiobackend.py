@@ -0,0 +1,151 @@
+#!/usr/bin/python3
+
+""" DIYHA GPIO Backend:
+    Select RPi.GPIO on a Pi or a simulated GPIO that runs on any Linux box.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import queue
+import threading
+import time
+
+# DIYHA_GPIO=simulated selects the simulator, anything else uses RPi.GPIO
+
+BACKEND_VARIABLE = "DIYHA_GPIO"
+SIMULATED = "simulated"
+
+
+class SimulatedGPIO:
+    """ RPi.GPIO compatible pin model with timestamped edge injection. """
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, ):
+        """ Pins start LOW; callbacks run on their own thread like RPi.GPIO. """
+        self.mode = None
+        self.levels = {}
+        self.callbacks = {}
+        self.watchers = {}
+        self.edges = queue.Queue()
+        self.lock = threading.Lock()
+        callback_thread = threading.Thread(target=self.dispatch_edges, args=())
+        callback_thread.daemon = True
+        callback_thread.start()
+
+    def clock(self, ):
+        """ Timestamps share the scheduler's monotonic clock. """
+        return time.monotonic()
+
+    def setmode(self, mode):
+        """ Record the pin numbering scheme. """
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        """ Accepted for compatibility. """
+        # pylint: disable=unused-argument
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        """ Configure a pin; an initial level is applied to outputs. """
+        # pylint: disable=unused-argument
+        with self.lock:
+            self.levels.setdefault(pin, self.LOW)
+            if initial is not None:
+                self.levels[pin] = initial
+
+    def output(self, pin, value):
+        """ Drive a pin and notify watchers with the write timestamp. """
+        stamp = self.clock()
+        with self.lock:
+            self.levels[pin] = value
+            watchers = self.watchers.get(pin, ())
+        for watcher in watchers:
+            watcher(pin, value, stamp)
+
+    def input(self, pin):
+        """ Current pin level. """
+        return self.levels.get(pin, self.LOW)
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        """ Register the edge callback for a pin. """
+        # pylint: disable=unused-argument
+        with self.lock:
+            self.callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        """ Drop the edge callback for a pin. """
+        with self.lock:
+            self.callbacks.pop(pin, None)
+
+    def cleanup(self, pin=None):
+        """ Forget callbacks and levels for one pin or all pins. """
+        with self.lock:
+            if pin is None:
+                self.levels.clear()
+                self.callbacks.clear()
+            else:
+                self.levels.pop(pin, None)
+                self.callbacks.pop(pin, None)
+
+    def watch(self, pin, watcher):
+        """ Call watcher(pin, value, timestamp) on every output to pin. """
+        with self.lock:
+            self.watchers[pin] = self.watchers.get(pin, ()) + (watcher,)
+
+    def inject_edge(self, pin, value):
+        """ Set an input level as a sensor would and return the edge timestamp. """
+        stamp = self.clock()
+        with self.lock:
+            previous = self.levels.get(pin, self.LOW)
+            self.levels[pin] = value
+            registered = self.callbacks.get(pin)
+        if registered is not None and previous != value:
+            edge, callback = registered
+            rising = value == self.HIGH
+            if edge == self.BOTH or (edge == self.RISING) == rising:
+                self.edges.put((callback, pin))
+        return stamp
+
+    def dispatch_edges(self, ):
+        """ Run edge callbacks in order, off the injecting thread. """
+        while True:
+            callback, pin = self.edges.get(True)
+            callback(pin)
+
+
+if os.environ.get(BACKEND_VARIABLE) == SIMULATED:
+    GPIO = SimulatedGPIO()
+else:
+    import RPi.GPIO as GPIO
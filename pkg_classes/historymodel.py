@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+
+""" DIYHA History Model:
+    Keep reported motion changes on the device and answer windowed queries.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import time
+from pkg_classes.ringbuffer import RingBuffer
+
+HISTORY_SIZE = 32768 # changes, 8 bytes each
+
+
+class HistoryModel:
+    """ Motion changes as monotonic times in a ring buffer, positive for motion
+        starting and negative for motion ending.
+    """
+
+    def __init__(self, capacity=HISTORY_SIZE):
+        """ Preallocate the ring buffer. """
+        self.lock = threading.Lock()
+        self.changes = RingBuffer(capacity, 'd')
+
+    def record(self, motion, stamp):
+        """ Store a reported 1 or 0 reading and when its first edge happened. """
+        with self.lock:
+            self.changes.append(stamp if motion else -stamp)
+
+    def snapshot(self, ):
+        """ Copy of the changes, oldest first; queries scan the copy so the
+            motion interrupt never waits for them.
+        """
+        with self.lock:
+            return self.changes.values()
+
+    def count(self, window, now):
+        """ Motion starts in the last window seconds. """
+        start = now - window
+        starts = 0
+        for change in reversed(self.snapshot()):
+            if abs(change) < start:
+                break
+            if change > 0:
+                starts += 1
+        return starts
+
+    def intervals(self, number, now):
+        """ The last number periods of motion, oldest first, as [seconds ago, seconds
+            long]; one still going lasts until now.
+        """
+        found = []
+        end = now
+        for change in reversed(self.snapshot()):
+            if len(found) >= number:
+                break
+            if change > 0:
+                found.append([round(now - change, 3), round(end - change, 3)])
+            else:
+                end = -change
+        found.reverse()
+        return found
+
+    def duty(self, window, now):
+        """ Fraction of the last window seconds with motion. """
+        start = now - window
+        busy = 0.0
+        end = now
+        for change in reversed(self.snapshot()):
+            stamp = abs(change)
+            if change > 0:
+                busy += end - max(stamp, start)
+            if stamp <= start:
+                break
+            end = stamp
+        return round(busy / window, 4) if window > 0 else 0.0
+
+    def query(self, request, now=None):
+        """ Answer a decoded JSON request such as {"query": "count", "window": 3600},
+            {"query": "duty", "window": 3600} or {"query": "intervals", "n": 10};
+            an "id" is echoed back. Raises ValueError or KeyError for a bad request.
+        """
+        if now is None:
+            now = time.monotonic()
+        if not isinstance(request, dict):
+            raise ValueError("request is not an object")
+        kind = request.get("query")
+        reply = {"id": request.get("id"), "query": kind}
+        if kind == "count":
+            reply["window"] = float(request["window"])
+            reply["count"] = self.count(reply["window"], now)
+        elif kind == "duty":
+            reply["window"] = float(request["window"])
+            reply["duty"] = self.duty(reply["window"], now)
+        elif kind == "intervals":
+            reply["intervals"] = self.intervals(int(request.get("n", 10)), now)
+        else:
+            raise ValueError("unknown query " + str(kind))
+        return reply
+
+    def __len__(self, ):
+        """ Changes held. """
+        return len(self.changes)
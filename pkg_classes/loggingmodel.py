@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+
+""" DIYHA Logging Model:
+    Queue log records to a background writer so disk stalls never reach the
+    GPIO, MQTT or timer threads.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+LOG_CAPACITY = 1000 # records buffered while the writer is stalled
+LOG_RATE = 20.0 # INFO and DEBUG records per second once the burst is spent
+LOG_BURST = 100
+# loggers that write a record per MQTT message; only these are rate limited
+HOT_LOGGERS = ("pkg_classes.topicrouter", "pkg_classes.whocontroller", "pkg_classes.testmodel")
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """ Never blocks: a record that does not fit is counted and dropped. """
+
+    def __init__(self, capacity):
+        """ Bounded queue shared with the writer thread. """
+        super().__init__(queue.Queue(capacity))
+        self.dropped = 0
+
+    def enqueue(self, record):
+        """ Queue without waiting. """
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """ Token bucket for records below WARNING; warnings and errors always pass. """
+
+    def __init__(self, rate, burst):
+        """ rate tokens per second up to burst. """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+        self.limited = 0
+
+    def filter(self, record):
+        """ Spend a token or drop the record. """
+        if record.levelno >= logging.WARNING:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return True
+            self.limited += 1
+            return False
+
+
+class DrainingQueueListener(logging.handlers.QueueListener):
+    """ The stop sentinel waits for room instead of failing on a full queue. """
+
+    def enqueue_sentinel(self, ):
+        """ Block until the writer makes room. """
+        self.queue.put(self._sentinel)
+
+
+class LoggingModel:
+    """ Move the configured root handlers behind a queue and a writer thread. """
+
+    def __init__(self, capacity=LOG_CAPACITY, rate=LOG_RATE, burst=LOG_BURST, hot=HOT_LOGGERS):
+        """ Prepare the queue handler and a rate limit shared by the hot loggers;
+            records from every other logger are never limited.
+        """
+        self.handler = BoundedQueueHandler(capacity)
+        self.limiter = RateLimitFilter(rate, burst)
+        for name in hot:
+            logging.getLogger(name).addFilter(self.limiter)
+        self.listener = None
+
+    def start(self, ):
+        """ Call after fileConfig: the file handlers now run on the writer thread. """
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+        if handlers:
+            # records no file handler wants are dropped before QueueHandler.prepare
+            # formats them on the GPIO and paho threads
+            self.handler.setLevel(min(handler.level for handler in handlers))
+        self.listener = DrainingQueueListener(self.handler.queue, *handlers,
+                                              respect_handler_level=True)
+        root.addHandler(self.handler)
+        self.listener.start()
+        # startup errors exit() before the explicit stop, still write them out
+        atexit.register(self.stop)
+
+    def stop(self, ):
+        """ Write out what is queued and stop the writer thread. """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def get_counters(self, ):
+        """ Records dropped on a full queue and records held back by the rate limit. """
+        return {"dropped": self.handler.dropped, "limited": self.limiter.limited}
@@ -0,0 +1,231 @@
+#!/usr/bin/python3
+
+""" DIYHA Loopback Broker:
+    In-process MQTT broker stand-in with paho compatible clients for benchmarks.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import queue
+import threading
+import time
+
+
+def topic_matches(subscription, topic):
+    """ MQTT subscription match with + and # wildcards. """
+    sub_levels = subscription.split('/')
+    topic_levels = topic.split('/')
+    for index, level in enumerate(sub_levels):
+        if level == '#':
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level not in ('+', topic_levels[index]):
+            return False
+    return len(sub_levels) == len(topic_levels)
+
+
+class LoopbackMessage:
+    """ The subset of paho MQTTMessage used by the message handlers. """
+
+    def __init__(self, topic, payload, qos, retain):
+        """ Payloads are delivered as bytes, as paho does. """
+        self.topic = topic
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        elif isinstance(payload, (int, float)):
+            payload = str(payload).encode('utf-8')
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class LoopbackBroker:
+    """ Route publishes to subscribed clients on one delivery thread. """
+
+    def __init__(self, ):
+        """ Start the delivery thread. """
+        self.clients = []
+        self.retained = {}
+        self.listeners = []
+        self.inbox = queue.Queue()
+        self.lock = threading.Lock()
+        self.published = 0
+        self.running = True
+        self.dropped = []
+        delivery_thread = threading.Thread(target=self.deliver, args=())
+        delivery_thread.daemon = True
+        delivery_thread.start()
+
+    def client(self, ):
+        """ A new paho compatible client attached to this broker. """
+        return LoopbackClient(self)
+
+    def listen(self, listener):
+        """ Call listener(message, timestamp) for every publish the broker accepts. """
+        self.listeners.append(listener)
+
+    def attach(self, client):
+        """ Register a connected client, refused while the broker is down. """
+        with self.lock:
+            if not self.running:
+                raise ConnectionRefusedError("loopback broker is down")
+            self.clients.append(client)
+
+    def outage(self, ):
+        """ Go down: every client loses its connection, publishes are refused
+            and retained messages are lost, as with a broker without persistence.
+        """
+        with self.lock:
+            self.running = False
+            self.dropped = list(self.clients)
+            self.clients = []
+            self.retained.clear()
+        for client in self.dropped:
+            client.lost()
+
+    def restart(self, ):
+        """ Come back up; clients dropped by the outage reconnect as paho's
+            network loop would.
+        """
+        with self.lock:
+            self.running = True
+            dropped, self.dropped = self.dropped, []
+        for client in dropped:
+            client.reconnect()
+
+    def detach(self, client):
+        """ Forget a disconnected client. """
+        with self.lock:
+            if client in self.clients:
+                self.clients.remove(client)
+
+    def accept(self, message):
+        """ Timestamp and queue a publish for delivery. """
+        stamp = time.monotonic()
+        for listener in self.listeners:
+            listener(message, stamp)
+        self.inbox.put(message)
+
+    def subscribed(self, client, subscription):
+        """ Send retained messages matching a new subscription. """
+        with self.lock:
+            matches = [message for topic, message in self.retained.items()
+                       if topic_matches(subscription, topic)]
+        for message in matches:
+            client.receive(message)
+
+    def deliver(self, ):
+        """ Fan out queued publishes in order. """
+        while True:
+            message = self.inbox.get(True)
+            with self.lock:
+                self.published += 1
+                if message.retain:
+                    self.retained[message.topic] = message
+                clients = list(self.clients)
+            for client in clients:
+                if client.matches(message.topic):
+                    client.receive(message)
+
+
+class LoopbackClient:
+    """ The subset of paho.mqtt.client.Client used by switch.py. """
+
+    def __init__(self, broker):
+        """ Callbacks are assigned by the caller as with paho. """
+        self.broker = broker
+        self.subscriptions = set()
+        self.on_connect = None
+        self.on_disconnect = None
+        self.on_message = None
+        self.connected_flag = False
+        self.disconnect_flag = False
+
+    def connect(self, host, port=1883, keepalive=60):
+        """ Attach to the broker and report a successful CONNACK. """
+        # pylint: disable=unused-argument
+        return self.reconnect()
+
+    def reconnect(self, ):
+        """ Attach again after a lost connection. """
+        self.broker.attach(self)
+        self.connected_flag = True
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return 0
+
+    def lost(self, ):
+        """ The broker went away: report an unexpected disconnect. """
+        self.connected_flag = False
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, None, 1)
+
+    def disconnect(self, ):
+        """ Detach from the broker. """
+        self.broker.detach(self)
+        self.connected_flag = False
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, None, 0)
+        return 0
+
+    def loop_start(self, ):
+        """ Delivery runs on the broker thread, nothing to start. """
+        return 0
+
+    def loop_stop(self, ):
+        """ Delivery runs on the broker thread, nothing to stop. """
+        return 0
+
+    def subscribe(self, topic, qos=0):
+        """ Add a subscription and receive matching retained messages. """
+        # pylint: disable=unused-argument
+        self.subscriptions.add(topic)
+        self.broker.subscribed(self, topic)
+        return (0, 0)
+
+    def unsubscribe(self, topic):
+        """ Drop a subscription. """
+        self.subscriptions.discard(topic)
+        return (0, 0)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """ Hand a message to the broker; without a connection it is lost and
+            MQTT_ERR_NO_CONN returned, as paho does.
+        """
+        if not self.connected_flag:
+            return (4, 0)
+        self.broker.accept(LoopbackMessage(topic, payload, qos, retain))
+        return (0, 0)
+
+    def matches(self, topic):
+        """ Is this client subscribed to the topic? """
+        for subscription in self.subscriptions:
+            if topic_matches(subscription, topic):
+                return True
+        return False
+
+    def receive(self, message):
+        """ Run the on_message callback as the paho network thread would. """
+        if self.on_message is not None:
+            self.on_message(self, None, message)
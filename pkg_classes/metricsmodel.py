@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+
+""" DIYHA Metrics Model:
+    Fixed bucket latency histograms for the hot paths, summarized over MQTT and
+    optionally served in Prometheus text format.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import bisect
+import threading
+
+# 10 us to 10 s in roughly 1-2.5-5 steps, seconds
+BOUNDS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+          0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HISTOGRAMS = {}
+COUNTERS = {}
+REGISTRY_LOCK = threading.Lock()
+
+
+class Histogram:
+    """ Bucket counts, sum and count of observations in seconds. Observations are
+        not locked: a rare lost increment costs less than a lock on every edge.
+    """
+
+    def __init__(self, name, description):
+        """ One slot per bound plus the overflow bucket. """
+        self.name = name
+        self.description = description
+        self.buckets = [0] * (len(BOUNDS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """ Count one duration. """
+        self.buckets[bisect.bisect_left(BOUNDS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, fraction):
+        """ Upper bound of the bucket holding the fraction quantile, None when
+            empty or beyond the last bound.
+        """
+        rank = fraction * self.count
+        seen = 0
+        for bound, bucket in zip(BOUNDS, self.buckets):
+            seen += bucket
+            if seen >= rank and seen > 0:
+                return bound
+        return None
+
+    def summary(self, ):
+        """ count, mean, p50 and p99 for the MQTT metrics topic. """
+        if self.count == 0:
+            return {"count": 0}
+        return {"count": self.count, "mean": round(self.sum / self.count, 6),
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+    def exposition(self, ):
+        """ Prometheus text format lines. """
+        lines = ["# HELP " + self.name + " " + self.description,
+                 "# TYPE " + self.name + " histogram"]
+        cumulative = 0
+        for bound, bucket in zip(BOUNDS, self.buckets):
+            cumulative += bucket
+            lines.append(self.name + '_bucket{le="' + repr(bound) + '"} ' + str(cumulative))
+        lines.append(self.name + '_bucket{le="+Inf"} ' + str(self.count))
+        lines.append(self.name + "_sum " + repr(self.sum))
+        lines.append(self.name + "_count " + str(self.count))
+        return lines
+
+
+class Counter:
+    """ A count of events, unlocked like the histograms. """
+
+    def __init__(self, name, description):
+        """ Nothing counted yet. """
+        self.name = name
+        self.description = description
+        self.count = 0
+
+    def inc(self, ):
+        """ Count one event. """
+        self.count += 1
+
+    def summary(self, ):
+        """ count for the MQTT metrics topic. """
+        return {"count": self.count}
+
+    def exposition(self, ):
+        """ Prometheus text format lines. """
+        return ["# HELP " + self.name + " " + self.description,
+                "# TYPE " + self.name + " counter",
+                self.name + " " + str(self.count)]
+
+
+def histogram(name, description):
+    """ The process wide histogram called name, created on first use. """
+    with REGISTRY_LOCK:
+        if name not in HISTOGRAMS:
+            HISTOGRAMS[name] = Histogram(name, description)
+        return HISTOGRAMS[name]
+
+
+def counter(name, description):
+    """ The process wide counter called name, created on first use. """
+    with REGISTRY_LOCK:
+        if name not in COUNTERS:
+            COUNTERS[name] = Counter(name, description)
+        return COUNTERS[name]
+
+
+def registered():
+    """ Every histogram and counter by name. """
+    with REGISTRY_LOCK:
+        metrics = dict(HISTOGRAMS)
+        metrics.update(COUNTERS)
+    return metrics
+
+
+def summary():
+    """ Every histogram and counter summarized by name. """
+    metrics = registered()
+    return {name: metrics[name].summary() for name in sorted(metrics)}
+
+
+def exposition():
+    """ Every histogram and counter in Prometheus text format. """
+    metrics = registered()
+    lines = []
+    for name in sorted(metrics):
+        lines.extend(metrics[name].exposition())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    """ GET /metrics on a daemon thread for a Prometheus scraper. """
+
+    def __init__(self, address):
+        """ address is host:port, an empty host listens on every interface. """
+        host, _, port = address.rpartition(':')
+        self.address = (host, int(port))
+        self.server = None
+
+    def start(self, ):
+        """ Bind and serve; http.server is only imported when metrics are served. """
+        # pylint: disable=import-outside-toplevel
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            """ /metrics only. """
+
+            def do_GET(self, ):
+                """ Prometheus text exposition. """
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                """ Scrapes are not worth a log line. """
+                # pylint: disable=redefined-builtin
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.server.daemon_threads = True
+        serve_thread = threading.Thread(target=self.server.serve_forever, args=())
+        serve_thread.daemon = True
+        serve_thread.start()
+
+    def stop(self, ):
+        """ Stop serving and release the port. """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -27,44 +27,157 @@
 # THE SOFTWARE.
 
 import queue
-import RPi.GPIO as GPIO
+import threading
+import time
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.historymodel import HistoryModel, HISTORY_SIZE
+from pkg_classes.metricsmodel import histogram
+
+EDGE_TO_QUEUE = histogram("motion_edge_to_queue_seconds",
+                          "PIR edge to the debounced reading queued")
+QUEUE_TO_PICKUP = histogram("motion_queue_to_pickup_seconds",
+                            "Reading queued to taken by the main loop")
 
 class MotionController:
     """ Abstract and manage a PIR motion snesor. """
 
-    def __init__(self, pin=27):
-        """ Initialize the PIR GPIO pin. """
+    def __init__(self, pin=27, rise_hold=0.0, fall_hold=0.0, max_rate=0.0,
+                 history=HISTORY_SIZE):
+        """ Initialize the PIR GPIO pin. A new reading is emitted once the pin has
+            held it for rise_hold or fall_hold seconds, and at most max_rate readings
+            per second are emitted; zero disables each stage. The last history
+            readings are kept for queries.
+        """
         self.pir_pin = pin
         GPIO.setmode(GPIO.BCM)  # Broadcom pin-numbering scheme
         GPIO.setup(self.pir_pin, GPIO.IN)
         self.queue = queue.Queue()
-        self.last_reading = 0
+        self.rise_hold = rise_hold
+        self.fall_hold = fall_hold
+        self.max_rate = max_rate
+        self.min_spacing = 1.0 / max_rate if max_rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.scheduler = None
+        self.timer = None
+        self.last_reading = 0   # raw pin level
+        self.reading_time = 0.0 # when the raw level last changed
+        self.emitted = 0        # level of the last queued reading
+        self.emit_time = float('-inf')
+        self.first_edge = None  # first edge of the pending change
+        self.edge_time = None   # first edge of the reading last taken from the queue
+        self.raw_edges = 0
+        self.events = 0
+        self.history = HistoryModel(history)
+        self.listener = None
         self.enable()
 
+    def start(self, scheduler):
+        """ Use the shared scheduler for readings held back by debounce or rate. """
+        self.scheduler = scheduler
+
     def pir_interrupt_handler(self, channel ):
-        """ Motion interrupt handler adds 1 or 0 to queue. """
+        """ Motion interrupt handler, debounced and coalesced into 1 or 0 readings. """
+        # pylint: disable=unused-argument
         state = GPIO.input(self.pir_pin)
-        print("pih: state=",state)
-        if state == 1:
-            message = "1"
-        else:
-            message = "0"
-        if state != self.last_reading:
-            self.queue.put(message)
-        self.last_reading = state
+        now = time.monotonic()
+        with self.lock:
+            self.raw_edges += 1
+            if state == self.last_reading:
+                return
+            self.last_reading = state
+            self.reading_time = now
+            if state == self.emitted:
+                # bounced back before it was emitted
+                self.first_edge = None
+                self.cancel_timer()
+                return
+            if self.first_edge is None:
+                self.first_edge = now
+            self.evaluate(now)
+
+    def evaluate(self, now):
+        """ Emit the pending reading when held long enough and the rate allows,
+            otherwise set a deadline; lock must be held.
+        """
+        hold = self.rise_hold if self.last_reading == 1 else self.fall_hold
+        due = max(self.reading_time + hold, self.emit_time + self.min_spacing)
+        if now >= due or self.scheduler is None:
+            self.cancel_timer()
+            self.emit(now)
+        elif self.timer is None:
+            self.timer = self.scheduler.call_at(due, self.manage_motion)
+
+    def manage_motion(self, ):
+        """ Deadline for a held back reading. """
+        with self.lock:
+            self.timer = None
+            if self.first_edge is not None:
+                self.evaluate(time.monotonic())
+
+    def cancel_timer(self, ):
+        """ Drop a pending deadline; lock must be held. """
+        if self.timer is not None:
+            self.scheduler.cancel(self.timer)
+            self.timer = None
+
+    def emit(self, now):
+        """ Queue the current reading with its first edge and queue times; lock
+            must be held.
+        """
+        self.emitted = self.last_reading
+        self.emit_time = now
+        self.queue.put(("1" if self.emitted == 1 else "0", self.first_edge, now))
+        if self.first_edge is not None:
+            EDGE_TO_QUEUE.observe(now - self.first_edge)
+        self.history.record(self.emitted == 1,
+                            now if self.first_edge is None else self.first_edge)
+        self.first_edge = None
+        self.events += 1
+        if self.listener is not None:
+            self.listener()
+
+    def get_counters(self, ):
+        """ Raw edges seen against readings emitted, for tuning the sensor. """
+        return {"edges": self.raw_edges, "events": self.events}
+
+    def set_debounce(self, rise_hold, fall_hold, max_rate):
+        """ Change the holds and rate limit; a reading already held back keeps its deadline. """
+        with self.lock:
+            self.rise_hold = rise_hold
+            self.fall_hold = fall_hold
+            self.max_rate = max_rate
+            self.min_spacing = 1.0 / max_rate if max_rate > 0 else 0.0
+
+    def set_listener(self, listener):
+        """ Call listener() after each queued reading. """
+        self.listener = listener
 
     def enable(self, ):
         """ Enable interrupts and prepare the callback. """
         GPIO.add_event_detect(self.pir_pin, GPIO.BOTH, callback=self.pir_interrupt_handler)
 
+    def stop(self, ):
+        """ Disable interrupts and release any thread blocked in wait_for_motion. """
+        GPIO.remove_event_detect(self.pir_pin)
+        with self.lock:
+            self.cancel_timer()
+        self.queue.put((None, None, None))
+
     def detected(self, ):
         """ Has motion been detected? True or false based on queue contents. """
         return not self.queue.empty()
 
+    def take(self, block):
+        """ Pop a reading and remember the time of its first edge. """
+        message, self.edge_time, queued = self.queue.get(block)
+        if queued is not None:
+            QUEUE_TO_PICKUP.observe(time.monotonic() - queued)
+        return message
+
     def get_motion(self, ):
         """ Return the last value either 1 or 0. """
-        return self.queue.get(False)
+        return self.take(False)
 
     def wait_for_motion(self, ):
-        """ Blocking wait for the next interrupt 1 or 0. """
-        return self.queue.get(True)
\ No newline at end of file
+        """ Blocking wait for the next interrupt 1 or 0, None after stop(). """
+        return self.take(True)
\ No newline at end of file
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+
+""" DIYHA Outbox Model:
+    Append only journal of publishes made while the broker is unreachable.
+    Each line is a publish [time, topic, payload, qos, retain], or a
+    {"discard": topic} tombstone for a retained publish a live one superseded.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import base64
+import collections
+import json
+import logging
+import os
+import time
+
+OUTBOX_BYTES = 256 * 1024 # journal size that triggers compaction
+
+
+class OutboxModel:
+    """ Pending publishes in memory, mirrored to a journal that survives restarts.
+        Retained publishes collapse to the latest value per topic.
+    """
+
+    def __init__(self, path, max_bytes=OUTBOX_BYTES):
+        """ Load whatever a previous process left in the journal. """
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.pending = collections.OrderedDict()
+        self.sequence = 0
+        self.journaled = 0
+        self.collapsed = 0
+        self.load()
+        self.journal = open(self.path, 'a')
+        self.size = self.journal.tell()
+
+    def __len__(self, ):
+        """ Number of publishes waiting for the broker. """
+        return len(self.pending)
+
+    def key(self, topic, retain):
+        """ Retained publishes share one slot per topic, others queue in order. """
+        if retain:
+            return topic
+        self.sequence += 1
+        return (topic, self.sequence)
+
+    def add(self, event):
+        """ Keep the newest retained value per topic, in arrival order. """
+        stamp, topic, payload, qos, retain = event
+        key = self.key(topic, retain)
+        if key in self.pending:
+            del self.pending[key]
+            self.collapsed += 1
+        self.pending[key] = event
+
+    def load(self, ):
+        """ Read the journal and rewrite it compacted. """
+        try:
+            with open(self.path) as journal:
+                for line in journal:
+                    try:
+                        event = json.loads(line)
+                        if isinstance(event, dict):
+                            self.pending.pop(event["discard"], None)
+                        else:
+                            self.add(event)
+                    except (KeyError, ValueError, TypeError):
+                        self.logger.error("Skipping damaged outbox line")
+        except FileNotFoundError:
+            return
+        if self.pending:
+            self.logger.info("Outbox> " + str(len(self.pending)) + " publishes from last run")
+        self.rewrite()
+
+    def rewrite(self, ):
+        """ Replace the journal with the pending publishes only. """
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as journal:
+            for event in self.pending.values():
+                journal.write(json.dumps(event) + '\n')
+        os.replace(temporary, self.path)
+
+    def append(self, topic, payload, qos, retain):
+        """ Record a publish the broker could not take; binary payloads are
+            journaled as {"base64": ...}.
+        """
+        if isinstance(payload, (bytes, bytearray)):
+            try:
+                payload = payload.decode('utf-8')
+            except UnicodeDecodeError:
+                payload = {"base64": base64.b64encode(payload).decode('ascii')}
+        elif payload is not None and not isinstance(payload, str):
+            payload = str(payload)
+        event = [time.time(), topic, payload, qos, retain]
+        self.add(event)
+        self.journaled += 1
+        self.write(event)
+
+    def write(self, entry):
+        """ Append one journal line, compacting when the journal is too big. """
+        line = json.dumps(entry) + '\n'
+        self.journal.write(line)
+        self.journal.flush()
+        self.size += len(line)
+        if self.size > self.max_bytes:
+            self.compact()
+
+    def compact(self, ):
+        """ Collapse the journal, then drop the oldest publishes if still too big. """
+        self.journal.close()
+        while self.pending and self.estimate() > self.max_bytes // 2:
+            self.pending.popitem(last=False)
+        self.rewrite()
+        self.journal = open(self.path, 'a')
+        self.size = self.journal.tell()
+
+    def estimate(self, ):
+        """ Journal bytes the pending publishes would take. """
+        return sum(len(json.dumps(event)) + 1 for event in self.pending.values())
+
+    def discard(self, topic):
+        """ A live retained publish supersedes the pending one; the tombstone
+            keeps a restart from replaying the stale value.
+        """
+        if self.pending.pop(topic, None) is not None:
+            self.write({"discard": topic})
+
+    def take(self, count):
+        """ Remove and return up to count of the oldest pending publishes. """
+        batch = []
+        while self.pending and len(batch) < count:
+            event = self.pending.popitem(last=False)[1]
+            if isinstance(event[2], dict):
+                event = list(event)
+                event[2] = base64.b64decode(event[2]["base64"])
+            batch.append(event)
+        return batch
+
+    def clear(self, ):
+        """ Everything was replayed, empty the journal. """
+        self.journal.seek(0)
+        self.journal.truncate()
+        self.size = 0
@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+""" DIYHA Publish Controller:
+    Single outbound path to the MQTT client that drops unchanged retained values
+    and coalesces bursts to the same topic.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import threading
+import time
+
+REPLAY_BATCH = 20 # outbox publishes per replay step
+REPLAY_INTERVAL = 0.1 # seconds between replay steps, 200 publishes per second
+
+
+def payload_size(topic, payload):
+    """ Approximate bytes on the wire for one publish. """
+    if payload is None:
+        return len(topic)
+    if isinstance(payload, (bytes, bytearray)):
+        return len(topic) + len(payload)
+    return len(topic) + len(str(payload).encode('utf-8'))
+
+
+class PublishController:
+    """ paho compatible publish() for the controllers and models. """
+
+    def __init__(self, client, window=0.0, outbox=None):
+        """ window: seconds after a publish during which later publishes to the
+            same topic are held and only the latest is sent.
+            outbox: OutboxModel that keeps publishes made while disconnected.
+        """
+        self.client = client
+        self.window = window
+        self.outbox = outbox
+        self.connected = outbox is None
+        self.scheduler = None
+        self.lock = threading.Lock()
+        self.retained = {}
+        self.sent_time = {}
+        self.pending = {}
+        self.published = 0
+        self.suppressed = 0
+        self.coalesced = 0
+        self.bytes_saved = 0
+        self.replayed = 0
+
+    def start(self, scheduler):
+        """ Coalescing needs the shared scheduler to flush held publishes. """
+        self.scheduler = scheduler
+
+    def reset(self, ):
+        """ Forget retained values, the broker may have lost them. """
+        with self.lock:
+            self.retained.clear()
+
+    def on_connect(self, ):
+        """ Broker accepted the connection: reset and replay the outbox. """
+        self.reset()
+        with self.lock:
+            self.connected = True
+        if self.outbox is not None and self.scheduler is not None:
+            self.scheduler.call_later(0.0, self.replay)
+
+    def on_disconnect(self, ):
+        """ Broker gone: publishes go to the outbox until the next connect. """
+        with self.lock:
+            self.connected = self.outbox is None
+
+    def replay(self, ):
+        """ Send one batch of outbox publishes and schedule the next. """
+        with self.lock:
+            if not self.connected:
+                return
+            for _, topic, payload, qos, retain in self.outbox.take(REPLAY_BATCH):
+                self.replayed += 1
+                self.send(topic, payload, qos, retain)
+            if len(self.outbox) == 0:
+                self.outbox.clear()
+                return
+        self.scheduler.call_later(REPLAY_INTERVAL, self.replay)
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """ Send, hold or drop one publish. """
+        with self.lock:
+            if not self.connected:
+                self.outbox.append(topic, payload, qos, retain)
+                return
+            if self.outbox is not None and retain:
+                self.outbox.discard(topic)
+            if topic in self.pending:
+                dropped = self.pending[topic]
+                self.coalesced += 1
+                self.bytes_saved += payload_size(topic, dropped[0])
+                self.pending[topic] = (payload, qos, retain)
+                return
+            if retain and topic in self.retained and self.retained[topic] == payload:
+                self.suppressed += 1
+                self.bytes_saved += payload_size(topic, payload)
+                return
+            if self.window > 0 and self.scheduler is not None:
+                now = time.monotonic()
+                sent = self.sent_time.get(topic)
+                if sent is not None and now - sent < self.window:
+                    self.pending[topic] = (payload, qos, retain)
+                    self.scheduler.call_at(sent + self.window, self.flush, topic)
+                    return
+                self.sent_time[topic] = now
+            self.send(topic, payload, qos, retain)
+
+    def flush(self, topic):
+        """ Window over, send the latest held publish unless it changes nothing. """
+        with self.lock:
+            held = self.pending.pop(topic, None)
+            if held is None:
+                return
+            payload, qos, retain = held
+            if not self.connected:
+                self.outbox.append(topic, payload, qos, retain)
+                return
+            if retain and topic in self.retained and self.retained[topic] == payload:
+                self.suppressed += 1
+                self.bytes_saved += payload_size(topic, payload)
+                return
+            self.sent_time[topic] = time.monotonic()
+            self.send(topic, payload, qos, retain)
+
+    def send(self, topic, payload, qos, retain):
+        """ Hand the publish to the client; lock must be held to keep order. """
+        self.published += 1
+        if retain:
+            self.retained[topic] = payload
+        self.client.publish(topic, payload, qos, retain)
+
+    def get_counters(self, ):
+        """ Messages sent, dropped as unchanged, merged in bursts and bytes saved. """
+        with self.lock:
+            counters = {"published": self.published, "suppressed": self.suppressed,
+                        "coalesced": self.coalesced, "bytes_saved": self.bytes_saved}
+            if self.outbox is not None:
+                counters["outboxed"] = self.outbox.journaled
+                counters["collapsed"] = self.outbox.collapsed
+                counters["replayed"] = self.replayed
+            return counters
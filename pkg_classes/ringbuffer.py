@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+
+""" DIYHA Ring Buffer:
+    Fixed capacity array backed sample store with window statistics.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from array import array
+
+
+class RingBuffer:
+    """ The newest capacity samples in a flat array, oldest overwritten first. """
+
+    def __init__(self, capacity, typecode='d'):
+        """ Preallocate capacity slots of the array typecode. """
+        self.capacity = max(1, int(capacity))
+        self.data = array(typecode, [0]) * self.capacity
+        self.head = 0
+        self.count = 0
+
+    def __len__(self, ):
+        """ Number of samples held. """
+        return self.count
+
+    def append(self, value):
+        """ Store a sample, overwriting the oldest when full. """
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def clear(self, ):
+        """ Forget every sample; the storage is kept. """
+        self.head = 0
+        self.count = 0
+
+    def values(self, ):
+        """ Samples from oldest to newest. """
+        start = (self.head - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            return self.data[start:start + self.count]
+        return self.data[start:] + self.data[:self.head]
+
+    def summary(self, ):
+        """ min, max, mean and nearest rank p95 of the samples, None when empty. """
+        if self.count == 0:
+            return None
+        ordered = sorted(self.values())
+        p95 = ordered[max(0, -(-95 * self.count // 100) - 1)]
+        return {"min": ordered[0], "max": ordered[-1],
+                "mean": sum(ordered) / self.count, "p95": p95}
@@ -0,0 +1,181 @@
+#!/usr/bin/python3
+
+""" DIYHA Rule Model:
+    Compile switch rules once and evaluate them locally on motion and message events.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import json
+import logging
+import math
+import time
+
+SUNRISE = "sunrise"
+SUNSET = "sunset"
+MOTION = "motion"
+ACTIONS = ("on", "off")
+
+
+def sun_times(day, latitude, longitude):
+    """ Local sunrise and sunset of a date as seconds after midnight, from the
+        sunrise equation; in polar night both fall at solar noon.
+    """
+    noon = time.mktime((day.tm_year, day.tm_mon, day.tm_mday, 12, 0, 0, 0, 0, -1))
+    cycle = round(noon / 86400.0 + 2440587.5 - 2451545.0 - 0.0008 + longitude / 360.0)
+    mean_solar = cycle - longitude / 360.0
+    anomaly = math.radians((357.5291 + 0.98560028 * mean_solar) % 360.0)
+    center = (1.9148 * math.sin(anomaly) + 0.02 * math.sin(2 * anomaly) +
+              0.0003 * math.sin(3 * anomaly))
+    ecliptic = math.radians((math.degrees(anomaly) + center + 180.0 + 102.9372) % 360.0)
+    transit = (2451545.0 + mean_solar + 0.0053 * math.sin(anomaly) -
+               0.0069 * math.sin(2 * ecliptic))
+    declination = math.asin(math.sin(ecliptic) * math.sin(math.radians(23.4397)))
+    phi = math.radians(latitude)
+    cos_hour = ((math.sin(math.radians(-0.833)) - math.sin(phi) * math.sin(declination)) /
+                (math.cos(phi) * math.cos(declination)))
+    hour = math.degrees(math.acos(max(-1.0, min(1.0, cos_hour))))
+    times = []
+    for julian in (transit - hour / 360.0, transit + hour / 360.0):
+        local = time.localtime((julian - 2440587.5) * 86400.0)
+        times.append(local.tm_hour * 3600 + local.tm_min * 60 + local.tm_sec)
+    return {SUNRISE: times[0], SUNSET: times[1]}
+
+
+class RuleModel:
+    """ Ordered rules of one zone; the first rule matching an event wins.
+        Rules arrive as a JSON list, for example:
+
+        [{"on": "motion", "after": "sunset", "before": "23:00", "action": "on", "for": 180},
+         {"on": "diy/main/door", "payload": "OPEN", "action": "on"}]
+
+        "on" is motion or an MQTT topic with an optional payload, "after" and
+        "before" are HH:MM, sunrise or sunset and may wrap midnight, "for" is
+        the seconds the switch stays on, the zone interval when left out.
+    """
+
+    def __init__(self, ):
+        """ No rules until they are loaded. """
+        self.logger = logging.getLogger(__name__)
+        self.rules = ()
+        self.latitude = None
+        self.longitude = None
+        self.sun_day = None
+        self.sun = {}
+        self.fired = 0
+
+    def set_site(self, latitude, longitude):
+        """ Where sunrise and sunset are calculated for. """
+        self.latitude = latitude
+        self.longitude = longitude
+        self.sun_day = None
+
+    def compile_time(self, value):
+        """ HH:MM to seconds after midnight, sunrise and sunset kept by name. """
+        if value is None:
+            return None
+        if value in (SUNRISE, SUNSET):
+            if self.latitude is None or self.longitude is None:
+                raise ValueError(value + " needs --latitude and --longitude")
+            return value
+        hours, minutes = (int(field) for field in value.split(":"))
+        if not (0 <= hours < 24 and 0 <= minutes < 60):
+            raise ValueError("time out of range " + value)
+        return hours * 3600 + minutes * 60
+
+    def compile_rule(self, rule):
+        """ Validate one rule into a (trigger, payload, after, before, action, for) tuple. """
+        trigger = rule.get("on", MOTION)
+        if not isinstance(trigger, str) or not trigger or trigger.startswith("$"):
+            raise ValueError("trigger must be motion or a topic: " + repr(trigger))
+        if "+" in trigger or "#" in trigger:
+            raise ValueError("wildcard trigger " + trigger)
+        action = rule.get("action", "on")
+        if action not in ACTIONS:
+            raise ValueError("unknown action " + str(action))
+        payload = rule.get("payload")
+        if payload is not None:
+            payload = payload.encode()
+        duration = rule.get("for")
+        if duration is not None:
+            duration = float(duration)
+            if not duration >= 0.0:
+                raise ValueError("for must be seconds of 0 or more: " + str(duration))
+        return (trigger, payload, self.compile_time(rule.get("after")),
+                self.compile_time(rule.get("before")), action, duration)
+
+    def load(self, payload):
+        """ Replace every rule at once; a bad rule set leaves the old one in place. """
+        try:
+            rules = json.loads(payload) if payload else []
+            compiled = tuple(self.compile_rule(rule) for rule in rules)
+        except (ValueError, TypeError, AttributeError) as error:
+            self.logger.error("Rules rejected: " + str(error))
+            return False
+        self.rules = compiled
+        self.logger.info("Rules> " + str(len(compiled)) + " loaded")
+        return True
+
+    def get_topics(self, ):
+        """ MQTT topics that trigger a rule. """
+        return {rule[0] for rule in self.rules if rule[0] != MOTION}
+
+    def resolve(self, bound, day):
+        """ Seconds after midnight of a compiled bound. """
+        if not isinstance(bound, str):
+            return bound
+        if self.sun_day != day[:3]:
+            self.sun = sun_times(day, self.latitude, self.longitude)
+            self.sun_day = day[:3]
+        return self.sun[bound]
+
+    def in_window(self, after, before, day):
+        """ True when the time of day lies in [after, before), wrapping midnight. """
+        if after is None and before is None:
+            return True
+        now = day.tm_hour * 3600 + day.tm_min * 60 + day.tm_sec
+        start = 0 if after is None else self.resolve(after, day)
+        end = 86400 if before is None else self.resolve(before, day)
+        if start <= end:
+            return start <= now < end
+        return now >= start or now < end
+
+    def evaluate(self, trigger, payload=None):
+        """ (action, seconds or None) of the first matching rule, or None. """
+        rules = self.rules
+        day = None
+        for rule_trigger, rule_payload, after, before, action, duration in rules:
+            if rule_trigger != trigger:
+                continue
+            if rule_payload is not None and rule_payload != payload:
+                continue
+            if day is None:
+                day = time.localtime()
+            if self.in_window(after, before, day):
+                self.fired += 1
+                return action, duration
+        return None
+
+    def get_counters(self, ):
+        """ Rules loaded and fired. """
+        return {"rules": len(self.rules), "fired": self.fired}
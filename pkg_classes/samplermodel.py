@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+""" DIYHA non-blocking CPU, temperature and disk sampler """
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2019 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+
+PROC_STAT = "/proc/stat"
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+
+
+class SamplerModel:
+    """ Read each metric without sleeping, keeping the kernel files open. """
+
+    def __init__(self, ):
+        ''' Open the counter files once and take the first cpu reading '''
+        self.stat_file = open( PROC_STAT )
+        try:
+            self.thermal_file = open( THERMAL_ZONE )
+        except OSError:
+            self.thermal_file = None # no thermal zone off a Pi
+        self.busy, self.total = self.read_cpu_times()
+
+    def read_cpu_times(self, ):
+        ''' busy and total jiffies from the aggregate cpu line '''
+        self.stat_file.seek( 0 )
+        fields = [int( field ) for field in self.stat_file.readline().split()[1:]]
+        total = sum( fields[:8] ) # guest time is already counted in user
+        idle = fields[3] + fields[4] # idle plus iowait
+        return total - idle, total
+
+    def cpu_percent(self, ):
+        ''' busy percentage since the previous call '''
+        busy, total = self.read_cpu_times()
+        elapsed = total - self.total
+        percent = 100.0 * ( busy - self.busy ) / elapsed if elapsed > 0 else 0.0
+        self.busy, self.total = busy, total
+        return percent
+
+    def celsius(self, ):
+        ''' SoC temperature, None without a thermal zone '''
+        if self.thermal_file is None:
+            return None
+        self.thermal_file.seek( 0 )
+        return int( self.thermal_file.read() ) / 1000.0
+
+    def disk_free(self, path='/'):
+        ''' free space for unprivileged users in GB '''
+        stats = os.statvfs( path )
+        # Divide from Bytes -> KB -> MB -> GB
+        return stats.f_bavail * stats.f_frsize / 1024.0 / 1024.0 / 1024.0
+
+    def close(self, ):
+        ''' release the file handles '''
+        self.stat_file.close()
+        if self.thermal_file is not None:
+            self.thermal_file.close()
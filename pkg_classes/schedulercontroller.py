@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+
+""" DIYHA Scheduler Controller:
+    Run callbacks at monotonic deadlines from a single timer thread.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+
+class SchedulerController:
+    """ Heap of monotonic deadlines shared by the switch, alarm and status models. """
+
+    def __init__(self, ):
+        """ Initialize an empty deadline heap. """
+        self.logger = logging.getLogger(__name__)
+        self.heap = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.active = False
+
+    def now(self, ):
+        """ The scheduler clock, immune to NTP and wall clock changes. """
+        return time.monotonic()
+
+    def call_at(self, deadline, callback, *args):
+        """ Run callback(*args) at a monotonic deadline and return a handle. """
+        entry = [deadline, next(self.sequence), callback, args]
+        with self.condition:
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] is entry:
+                self.condition.notify()
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        """ Run callback(*args) after delay seconds and return a handle. """
+        return self.call_at(self.now() + delay, callback, *args)
+
+    def cancel(self, entry):
+        """ Cancel a pending deadline; the heap entry is discarded when it surfaces. """
+        entry[2] = None
+
+    def start(self, ):
+        """ Start the timer thread """
+        self.active = True
+        timer_thread = threading.Thread(target=self.run, args=())
+        timer_thread.daemon = True
+        timer_thread.start()
+
+    def stop(self, ):
+        """ Stop the timer thread, pending deadlines are dropped. """
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+
+    def run(self, ):
+        """ Sleep until the earliest deadline, or indefinitely when none is due. """
+        with self.condition:
+            while self.active:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                entry = self.heap[0]
+                if entry[2] is None:
+                    heapq.heappop(self.heap)
+                    continue
+                delay = entry[0] - self.now()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self.heap)
+                callback, args = entry[2], entry[3]
+                entry[2] = None
+                self.condition.release()
+                try:
+                    callback(*args)
+                except Exception:  # pylint: disable=broad-except
+                    self.logger.exception("Scheduled callback failed")
+                finally:
+                    self.condition.acquire()
+
+
+class AsyncSchedulerController:
+    """ The SchedulerController interface on an asyncio event loop. Like the
+        timer thread it may be called from any thread: deadlines set or cancelled
+        off the loop thread, such as from a GPIO callback, reach the loop through
+        call_soon_threadsafe.
+    """
+
+    def __init__(self, loop):
+        """ Deadlines become loop timer handles, callbacks run on the loop thread. """
+        self.logger = logging.getLogger(__name__)
+        self.loop = loop
+        self.thread = None
+        loop.call_soon_threadsafe(self.note_thread)
+
+    def note_thread(self, ):
+        """ The first callback on the loop learns which thread runs it. """
+        self.thread = threading.get_ident()
+
+    def now(self, ):
+        """ The loop clock, time.monotonic() by default. """
+        return self.loop.time()
+
+    def on_loop(self, ):
+        """ Is the caller running on this scheduler's loop? Checked by thread
+            so the threaded runtime never has to import asyncio.
+        """
+        return threading.get_ident() == self.thread
+
+    def call_at(self, deadline, callback, *args):
+        """ Run callback(*args) at a monotonic deadline and return a handle. """
+        entry = [deadline, None, callback, args] # deadline, loop handle, callback, args
+        if self.on_loop():
+            self.arm(entry)
+        else:
+            self.loop.call_soon_threadsafe(self.arm, entry)
+        return entry
+
+    def call_later(self, delay, callback, *args):
+        """ Run callback(*args) after delay seconds and return a handle. """
+        return self.call_at(self.now() + delay, callback, *args)
+
+    def arm(self, entry):
+        """ Set the loop timer of a deadline not cancelled meanwhile. """
+        if entry[2] is not None:
+            entry[1] = self.loop.call_at(entry[0], self.fire, entry)
+
+    def fire(self, entry):
+        """ Deadline reached, run the callback unless it was cancelled. """
+        callback, args = entry[2], entry[3]
+        entry[2] = None
+        if callback is None:
+            return
+        try:
+            callback(*args)
+        except Exception:  # pylint: disable=broad-except
+            self.logger.exception("Scheduled callback failed")
+
+    def cancel(self, entry):
+        """ Cancel a pending deadline; off the loop thread its timer is left to
+            expire as a no-op.
+        """
+        entry[2] = None
+        if entry[1] is not None and self.on_loop():
+            entry[1].cancel()
+
+    def start(self, ):
+        """ The event loop is the timer, nothing to start. """
+
+    def stop(self, ):
+        """ The event loop is the timer, nothing to stop. """
@@ -0,0 +1,211 @@
+#!/usr/bin/python3
+
+""" DIYHA Self Test Controller:
+    On-device timing of the GPIO, relay, scheduler, broker and motion paths,
+    published as one report so field units can be compared remotely.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import json
+import logging
+import threading
+import time
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes import metricsmodel
+
+GPIO_ROUNDS = 200     # write then read back of each relay pin
+RELAY_TOGGLES = 3     # on and off of each idle relay when asked for
+JITTER_ROUNDS = 50    # scheduler deadlines
+JITTER_SPACING = 0.01 # seconds between them
+ECHO_ROUNDS = 20      # publishes to ourselves through the broker
+ECHO_TIMEOUT = 2.0    # seconds before a probe counts as lost
+
+
+def timing(samples):
+    """ count, mean, p50, p99 and max of samples in seconds. """
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    def rank(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 6)
+    return {"count": len(ordered), "mean": round(sum(ordered) / len(ordered), 6),
+            "p50": rank(0.5), "p99": rank(0.99), "max": round(ordered[-1], 6)}
+
+
+class SelfTestController:
+    """ Run the diagnostic one step at a time on the shared scheduler, so it
+        works the same with either runtime and never blocks the network loop.
+    """
+
+    def __init__(self, zones, topic):
+        """ The report goes to topic, the broker probe to topic/echo. """
+        self.logger = logging.getLogger(__name__)
+        self.zones = zones
+        self.client = None
+        self.publisher = None
+        self.topic = topic
+        self.echo_topic = topic + '/echo'
+        self.lock = threading.Lock()
+        self.scheduler = None
+        self.running = False
+        self.relay = False
+        self.report = {}
+        self.samples = []
+        self.lost = 0
+        self.sequence = 0
+        self.sent = 0.0
+        self.timer = None
+
+    def set_client(self, client, publisher):
+        """ The raw client probes the broker, the report goes through publisher """
+        self.client = client
+        self.publisher = publisher
+
+    def start(self, scheduler):
+        """ Register the test steps with the shared scheduler """
+        self.scheduler = scheduler
+
+    def run(self, relay=False):
+        """ Start the diagnostic; relay also toggles every relay that is off. """
+        with self.lock:
+            if self.running or self.scheduler is None or self.client is None:
+                self.logger.warning("Self test already running or not started")
+                return
+            self.running = True
+        self.relay = relay
+        self.report = {"started": round(time.time(), 3)}
+        self.logger.info("Self test started")
+        self.scheduler.call_later(0.0, self.test_gpio)
+
+    def test_gpio(self, ):
+        """ Write each relay pin at its level and read it back, then toggle idle
+            relays if asked; under the switch lock so no state change interleaves.
+        """
+        round_trip = []
+        toggles = []
+        mismatches = 0
+        for zone in self.zones:
+            switch = zone.switch
+            with switch.lock:
+                level = GPIO.input(switch.switch_pin)
+                for _ in range(GPIO_ROUNDS):
+                    start = time.monotonic()
+                    GPIO.output(switch.switch_pin, level)
+                    if GPIO.input(switch.switch_pin) != level:
+                        mismatches += 1
+                    round_trip.append(time.monotonic() - start)
+                if self.relay and switch.state == "OFF":
+                    for _ in range(RELAY_TOGGLES):
+                        start = time.monotonic()
+                        GPIO.output(switch.switch_pin, GPIO.HIGH)
+                        GPIO.output(switch.switch_pin, GPIO.LOW)
+                        toggles.append((time.monotonic() - start) / 2)
+        self.report["gpio"] = dict(timing(round_trip), mismatches=mismatches)
+        if self.relay:
+            self.report["relay"] = timing(toggles)
+        self.samples = []
+        start = self.scheduler.now() + JITTER_SPACING
+        for index in range(JITTER_ROUNDS):
+            deadline = start + index * JITTER_SPACING
+            self.scheduler.call_at(deadline, self.test_jitter, deadline)
+
+    def test_jitter(self, deadline):
+        """ How late each scheduler deadline ran. """
+        self.samples.append(self.scheduler.now() - deadline)
+        if len(self.samples) < JITTER_ROUNDS:
+            return
+        self.report["scheduler"] = timing(self.samples)
+        self.samples = []
+        self.lost = 0
+        self.sequence = 0
+        self.client.message_callback_add(self.echo_topic, self.on_echo)
+        # the broker handles the subscribe before the first probe behind it
+        self.client.subscribe(self.echo_topic, 1)
+        self.send_probe()
+
+    def send_probe(self, ):
+        """ Publish the next numbered probe and arm its timeout. """
+        with self.lock:
+            self.sequence += 1
+            self.sent = time.monotonic()
+            self.timer = self.scheduler.call_later(ECHO_TIMEOUT, self.probe_lost,
+                                                   self.sequence)
+        self.client.publish(self.echo_topic, str(self.sequence), 1, False)
+
+    def on_echo(self, client, userdata, msg):
+        """ Our probe came back through the broker. """
+        # pylint: disable=unused-argument
+        now = time.monotonic()
+        with self.lock:
+            if msg.payload != str(self.sequence).encode() or self.timer is None:
+                return
+            self.scheduler.cancel(self.timer)
+            self.timer = None
+            self.samples.append(now - self.sent)
+        self.scheduler.call_later(0.0, self.next_probe)
+
+    def probe_lost(self, sequence):
+        """ No echo within ECHO_TIMEOUT. """
+        with self.lock:
+            if sequence != self.sequence or self.timer is None:
+                return
+            self.timer = None
+            self.lost += 1
+        self.next_probe()
+
+    def next_probe(self, ):
+        """ Another probe, or the broker summary once all are done. """
+        if self.sequence < ECHO_ROUNDS:
+            self.send_probe()
+            return
+        self.client.unsubscribe(self.echo_topic)
+        self.client.message_callback_remove(self.echo_topic)
+        self.report["mqtt"] = dict(timing(self.samples), lost=self.lost)
+        self.test_motion()
+
+    def test_motion(self, ):
+        """ Motion pipeline health per zone, without faking motion, and the
+            hot path histograms since startup.
+        """
+        zones = {}
+        for zone in self.zones:
+            counters = zone.motion.get_counters()
+            zones[zone.get_location()] = {"pir": GPIO.input(zone.motion.pir_pin),
+                                          "edges": counters["edges"],
+                                          "readings": counters["events"],
+                                          "queued": zone.motion.queue.qsize(),
+                                          "history": len(zone.motion.history)}
+        latency = metricsmodel.summary()
+        self.report["motion"] = {"zones": zones,
+                                 "latency": {name: latency[name] for name in latency
+                                             if name.startswith("motion_")}}
+        self.finish()
+
+    def finish(self, ):
+        """ Publish the report retained and allow the next run. """
+        self.report["seconds"] = round(time.time() - self.report["started"], 3)
+        self.publisher.publish(self.topic, json.dumps(self.report), 1, True)
+        self.logger.info("Self test done in " + str(self.report["seconds"]) + "s")
+        with self.lock:
+            self.running = False
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+
+""" DIYHA Snapshot Controller:
+    Fold the per-topic device state into one compact retained message.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import json
+import logging
+import struct
+import threading
+import time
+
+CHANGE_HOLD = 1.0 # seconds, changes closer than this share one snapshot
+
+
+def cbor_head(major, length):
+    """ CBOR initial byte and argument. """
+    if length < 24:
+        return bytes([major << 5 | length])
+    for info, size, code in ((24, 1, '>B'), (25, 2, '>H'), (26, 4, '>I'), (27, 8, '>Q')):
+        if length < 1 << (8 * size):
+            return bytes([major << 5 | info]) + struct.pack(code, length)
+    raise ValueError("CBOR argument too large")
+
+
+def cbor_dumps(value):
+    """ Encode the JSON types as CBOR (RFC 8949), floats as float32 when exact. """
+    if value is None:
+        return b'\xf6'
+    if value is True:
+        return b'\xf5'
+    if value is False:
+        return b'\xf4'
+    if isinstance(value, int):
+        if value >= 0:
+            return cbor_head(0, value)
+        return cbor_head(1, -1 - value)
+    if isinstance(value, float):
+        try:
+            single = struct.pack('>f', value)
+        except OverflowError: # beyond float32 range
+            single = None
+        if single is not None and struct.unpack('>f', single)[0] == value:
+            return b'\xfa' + single
+        return b'\xfb' + struct.pack('>d', value) # also NaN, which never compares equal
+    if isinstance(value, str):
+        encoded = value.encode('utf-8')
+        return cbor_head(3, len(encoded)) + encoded
+    if isinstance(value, (list, tuple)):
+        return cbor_head(4, len(value)) + b''.join(cbor_dumps(item) for item in value)
+    if isinstance(value, dict):
+        return cbor_head(5, len(value)) + b''.join(
+            cbor_dumps(key) + cbor_dumps(item) for key, item in value.items())
+    raise TypeError("cannot encode " + type(value).__name__)
+
+
+def json_dumps(value):
+    """ JSON without optional whitespace. """
+    return json.dumps(value, separators=(',', ':'))
+
+
+def parse_stats(payload):
+    """ "min=1.0 max=2.0" status stats to a dictionary of floats. """
+    stats = {}
+    for pair in payload.split():
+        key, _, number = pair.partition('=')
+        stats[key] = float(number)
+    return stats
+
+
+class SnapshotController:
+    """ Sits in front of the publisher: publishes on tracked topics update the
+        snapshot and, unless legacy topics are off, are passed on as well.
+    """
+
+    def __init__(self, client, topic, encoding='json', interval=0.0, legacy=True):
+        """ interval 0 publishes on change, otherwise every interval seconds. """
+        self.logger = logging.getLogger(__name__)
+        self.client = client
+        self.topic = topic
+        self.encode = cbor_dumps if encoding == 'cbor' else json_dumps
+        self.interval = interval
+        self.legacy = legacy
+        self.tracked = {}
+        self.state = {}
+        self.sequence = 0
+        self.sent_time = float('-inf')
+        self.lock = threading.Lock()
+        self.scheduler = None
+        self.timer = None
+        self.deadline = 0.0
+
+    def track(self, topic, path, convert=str):
+        """ Keep convert(payload) of topic at the key path, a tuple of keys. """
+        self.tracked[topic] = (path, convert)
+
+    def untrack(self, topic):
+        """ Stop following topic and drop its value, and keys left empty, from
+            the snapshot.
+        """
+        field = self.tracked.pop(topic, None)
+        if field is None:
+            return
+        path = field[0]
+        with self.lock:
+            nodes = [self.state]
+            for key in path[:-1]:
+                nodes.append(nodes[-1].get(key, {}))
+            nodes[-1].pop(path[-1], None)
+            for depth in range(len(path) - 1, 0, -1):
+                if nodes[depth]:
+                    break
+                nodes[depth - 1].pop(path[depth - 1], None)
+
+    def start(self, scheduler):
+        """ Send the first snapshot and, with an interval, the periodic deadline. """
+        self.scheduler = scheduler
+        if self.interval > 0:
+            self.deadline = scheduler.now()
+            self.tick()
+        else:
+            self.changed()
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """ The client publish interface. """
+        field = self.tracked.get(topic)
+        if field is not None:
+            path, convert = field
+            if isinstance(payload, (bytes, bytearray)):
+                payload = payload.decode('utf-8')
+            try:
+                value = convert(payload)
+            except ValueError:
+                value = payload
+            if self.update(path, value) and self.interval <= 0:
+                self.changed()
+            if not self.legacy:
+                return
+        self.client.publish(topic, payload, qos, retain)
+
+    def update(self, path, value):
+        """ Store the value, True when it changed. """
+        with self.lock:
+            node = self.state
+            for key in path[:-1]:
+                node = node.setdefault(key, {})
+            if node.get(path[-1]) == value:
+                return False
+            node[path[-1]] = value
+            return True
+
+    def changed(self, ):
+        """ Send now, or once CHANGE_HOLD has passed since the last snapshot. """
+        with self.lock:
+            if self.timer is not None or self.scheduler is None:
+                return
+            due = self.sent_time + CHANGE_HOLD
+            if time.monotonic() < due:
+                self.timer = self.scheduler.call_at(due, self.flush)
+                return
+        self.send()
+
+    def flush(self, ):
+        """ Hold over, send the latest state. """
+        with self.lock:
+            self.timer = None
+        self.send()
+
+    def tick(self, ):
+        """ Periodic snapshot. """
+        self.send()
+        with self.lock:
+            if self.scheduler is None:
+                return
+            self.deadline += self.interval
+            self.timer = self.scheduler.call_at(self.deadline, self.tick)
+
+    def send(self, ):
+        """ Publish the state with a sequence number and monotonic timestamp. """
+        with self.lock:
+            self.sequence += 1
+            self.sent_time = time.monotonic()
+            snapshot = {"seq": self.sequence, "t": round(self.sent_time, 3)}
+            snapshot.update(self.state)
+            # under the lock so sequence numbers reach the publisher in order
+            self.client.publish(self.topic, self.encode(snapshot), 0, True)
+
+    def stop(self, ):
+        """ Drop the pending deadline. """
+        with self.lock:
+            if self.timer is not None:
+                self.scheduler.cancel(self.timer)
+                self.timer = None
+            self.scheduler = None
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+""" DIYHA State File Model:
+    Switch and alarm state in a small memory mapped file so a restarted process
+    picks up where the last one stopped.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+
+STATE_SLOTS = 16 # switches and alarms the file has room for
+VERSION = 1
+MAGIC = b'DIYS'
+SWITCH = 1
+ALARM = 2
+
+# magic, version, boot id, monotonic time of a clean stop or 0
+HEADER = struct.Struct('<4sI16sd')
+# kind, pin, state, monotonic time of the last motion, seconds held after it
+SLOT = struct.Struct('<hhidd')
+
+
+def boot_id():
+    """ Kernel boot id; monotonic times only mean something within one boot. """
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as boot:
+            return uuid.UUID(boot.read().strip()).bytes
+    except (OSError, ValueError):
+        return bytes(16)
+
+
+class StateFileModel:
+    """ One fixed size slot per switch or alarm pin. Writes go to the shared
+        mapping, so they survive the process being killed without a write per
+        change reaching the SD card; a reboot starts cold.
+    """
+
+    def __init__(self, path, slots=STATE_SLOTS):
+        """ Map the file and read what the previous process left, if it ran
+            in this boot.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self.slots = {}   # (kind, pin) -> slot index
+        self.saved = {}   # (kind, pin) -> (state, last motion, hold) at startup
+        self.stopped = 0.0
+        self.map = None
+        size = HEADER.size + slots * SLOT.size
+        try:
+            descriptor = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(descriptor).st_size != size:
+                    os.ftruncate(descriptor, size)
+                self.map = mmap.mmap(descriptor, size)
+            finally:
+                os.close(descriptor)
+        except OSError as error:
+            self.logger.error("State file unavailable, starting cold: " + str(error))
+            return
+        self.capacity = slots
+        self.load()
+
+    def load(self, ):
+        """ Take the slots of a previous process in this boot, or start empty. """
+        magic, version, boot, stopped = HEADER.unpack_from(self.map, 0)
+        if magic == MAGIC and version == VERSION and boot == boot_id():
+            self.stopped = stopped
+            for index in range(self.capacity):
+                kind, pin, state, last_motion, hold = SLOT.unpack_from(
+                    self.map, HEADER.size + index * SLOT.size)
+                if kind != 0:
+                    self.slots[(kind, pin)] = index
+                    self.saved[(kind, pin)] = (state, last_motion, hold)
+            self.logger.info("State file> " + str(len(self.saved)) + " restored")
+        else:
+            self.map[:] = bytes(len(self.map))
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, boot_id(), 0.0)
+
+    def restore(self, kind, pin):
+        """ (state, last motion, hold) the previous process saved, or None. """
+        return self.saved.get((kind, pin))
+
+    def save(self, kind, pin, state, last_motion=0.0, hold=0.0):
+        """ Overwrite the slot of a pin in place. """
+        if self.map is None:
+            return
+        index = self.slots.get((kind, pin))
+        if index is None:
+            with self.lock:
+                index = self.slots.setdefault((kind, pin), len(self.slots))
+        if index >= self.capacity:
+            return
+        SLOT.pack_into(self.map, HEADER.size + index * SLOT.size,
+                       kind, pin, state, last_motion, hold)
+
+    def close(self, ):
+        """ Note the clean stop for the next process's restart time, write out
+            and unmap.
+        """
+        if self.map is None:
+            return
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, boot_id(), time.monotonic())
+        self.map.flush()
+        self.map.close()
+        self.map = None
@@ -23,120 +23,131 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import socket
 import logging
-import logging.config
-import subprocess
-from threading import Thread
-from time import sleep
-import psutil
-from gpiozero import CPUTemperature
+import threading
+from pkg_classes.factsmodel import FactsModel
+from pkg_classes.ringbuffer import RingBuffer
+from pkg_classes.samplermodel import SamplerModel
+
+
+SAMPLE_INTERVAL = 60 # seconds between samples
+PUBLISH_INTERVAL = 15 * 60 # summarize and publish every 15 minutes
 
 
 class StatusModel:
     """ Collect CPU and OS metrics. Publish and log the information every 15 minutes. """
 
-    def __init__(self, client):
-        ''' Setup MQTT topics and initialize data elements '''
+    def __init__(self, client, sample_interval=SAMPLE_INTERVAL, publish_interval=PUBLISH_INTERVAL,
+                 host=None):
+        ''' Setup MQTT topics and a ring buffer per metric sized to one publish window;
+            host overrides the host name in the topics '''
         self.client = client
-        logging.config.fileConfig( fname="/usr/local/switch/logging.ini",
-                                   disable_existing_loggers=False )
-        # Get the logger specified in the file
         self.logger = logging.getLogger( __name__ )
         self.logger.info( "Status Model started" )
-        self.host = socket.gethostname()
+        self.facts = FactsModel()
+        self.host = host if host is not None else self.facts.get_host()
         self.cpu_topic = "diy/" + self.host + "/cpu"
         self.celsius_topic = "diy/" + self.host + "/cpucelsius"
         self.disk_topic = "diy/" + self.host + "/disk"
         self.os_version_topic = "diy/" + self.host + "/os"
         self.pi_version_topic = "diy/" + self.host + "/pi"
         self.ip_address_topic = "diy/" + self.host + "/ip"
-        self.cpu_accumulator = 0.0
-        self.celsius_accumulator = 0.0
-        self.disk_free_accumulator = 0.0
-        self.iterations = 0.0
+        self.sample_interval = sample_interval
+        self.samples_per_publish = max( 1, int( round( publish_interval / sample_interval ) ) )
+        self.cpu_samples = RingBuffer( self.samples_per_publish )
+        self.celsius_samples = RingBuffer( self.samples_per_publish )
+        self.disk_free_samples = RingBuffer( self.samples_per_publish )
+        self.iterations = 0
+        self.sampler = None
+        self.scheduler = None
+        self.timer = None
+        self.deadline = 0.0
+        self.inactive = True
+        self.lock = threading.Lock()
 
     def collect_data(self, ):
-        ''' collect one sample of data '''
-        self.cpu_accumulator += psutil.cpu_percent( interval=1 )
-        cpu = CPUTemperature()
-        self.celsius_accumulator += cpu.temperature
-        disk = psutil.disk_usage( '/' )
-        # Divide from Bytes -> KB -> MB -> GB
-        self.disk_free_accumulator += round( disk.free / 1024.0 / 1024.0 / 1024.0, 1 )
-        self.iterations += 1.0
+        ''' collect one sample of data without blocking '''
+        self.cpu_samples.append( self.sampler.cpu_percent() )
+        celsius = self.sampler.celsius()
+        if celsius is not None:
+            self.celsius_samples.append( celsius )
+        self.disk_free_samples.append( self.sampler.disk_free() )
+        self.iterations += 1
+
+    def publish_summary(self, topic, name, samples):
+        ''' publish the window mean on the topic and min max mean p95 on topic/stats '''
+        summary = samples.summary()
+        if summary is None:
+            return
+        info = "{0:.1f}".format( summary["mean"] )
+        self.client.publish( topic, info, 0, True )
+        stats = " ".join( key + "=" + "{0:.1f}".format( value ) for key, value in summary.items() )
+        self.client.publish( topic + "/stats", stats, 0, True )
+        self.logger.info( name + ": " + stats )
 
     def publish_averages(self, ):
         ''' publish cpu temperature and free disk to MQTT '''
         if self.iterations > 0:
-            cpu = self.cpu_accumulator / self.iterations
-            celsius = self.celsius_accumulator / self.iterations
-            free = self.disk_free_accumulator / self.iterations
-            info = "{0:.1f}".format( cpu )
-            self.client.publish( self.cpu_topic, str( info ), 0, True )
-            self.logger.info( "CPU: " + str( info ) )
-            info = "{0:.1f}".format( celsius )
-            self.client.publish( self.celsius_topic, str( info ), 0, True )
-            self.logger.info( "Celsius: " + str( info ) )
-            info = "{0:.1f}".format( free )
-            self.client.publish( self.disk_topic, str( info ), 0, True )
-            self.logger.info( "Disk: " + str( info ) )
-            self.cpu_accumulator = 0.0
-            self.celsius_accumulator = 0.0
-            self.disk_free_accumulator = 0.0
-            self.iterations = 0.0
+            self.publish_summary( self.cpu_topic, "CPU", self.cpu_samples )
+            self.publish_summary( self.celsius_topic, "Celsius", self.celsius_samples )
+            self.publish_summary( self.disk_topic, "Disk", self.disk_free_samples )
+            self.cpu_samples.clear()
+            self.celsius_samples.clear()
+            self.disk_free_samples.clear()
+            self.iterations = 0
 
     def publish_os_version(self, ):
         ''' get the current os version and make available to observers '''
-        cmd = subprocess.Popen( 'cat /etc/os-release', shell=True, stdout=subprocess.PIPE )
-        for line in cmd.stdout:
-            if b'=' in line:
-                key, value = line.split( b'=' )
-                if b'VERSION' == key:
-                    data, chaff = value.split( b'\n' )
-                    strData = str( data, 'utf-8' )
-                    osVersion = "Raspbian " + strData.replace( '"', '' )
-                    self.client.publish( self.os_version_topic, osVersion, 0, True )
-                    self.logger.info( osVersion )
+        os_version = self.facts.get_os_version()
+        if os_version is not None:
+            self.client.publish( self.os_version_topic, os_version, 0, True )
+            self.logger.info( os_version )
 
     def publish_pi_version(self, ):
         ''' get the current pi version and make available to observers '''
-        cmd = subprocess.Popen( 'cat /proc/device-tree/model', shell=True, stdout=subprocess.PIPE )
-        for line in cmd.stdout:
-            key, value = line.split( b' Pi ' )
-            data, chaff = value.split( b'\x00' )
-            piVersion = "Raspberry Pi " + str( data, 'utf-8' )
-            self.client.publish( self.pi_version_topic, piVersion, 0, True )
-            self.logger.info( piVersion )
+        pi_version = self.facts.get_pi_version()
+        if pi_version is not None:
+            self.client.publish( self.pi_version_topic, pi_version, 0, True )
+            self.logger.info( pi_version )
 
     def publish_ip_address(self, ):
         ''' get the current ip address and make available to observers '''
-        self.host = socket.gethostname()
-        self.ip_address = subprocess.check_output( ["hostname", "-I"] )
+        self.ip_address = self.facts.get_ip_address()
         self.client.publish( self.ip_address_topic, self.ip_address, 0, True )
         self.logger.info( self.host )
         self.logger.info( self.ip_address )
 
-    def start(self):
-        """ Start the monitoring thread """
+    def start(self, scheduler):
+        """ Publish static facts and register the sampling deadline """
         self.publish_os_version()
         self.publish_pi_version()
         self.publish_ip_address()
+        self.sampler = SamplerModel()
+        self.scheduler = scheduler
         self.inactive = False
-        led_thread = Thread( target=self.collect_metrics, args=() )
-        led_thread.daemon = True
-        led_thread.start()
+        self.deadline = scheduler.now() + self.sample_interval
+        self.timer = scheduler.call_at( self.deadline, self.collect_metrics )
 
     def collect_metrics(self):
-        """ sleep and then collect data, averaging every 15 minutes """
-        while True:
+        """ collect a sample every interval, summarizing every publish window """
+        with self.lock:
             if self.inactive:
                 return
-            sleep( 60 )
             self.collect_data()
-            if self.iterations >= 15.0:
+            if self.facts.ip_address_changed():
+                self.publish_ip_address()
+            if self.iterations >= self.samples_per_publish:
                 self.publish_averages()
+            self.deadline += self.sample_interval
+            self.timer = self.scheduler.call_at( self.deadline, self.collect_metrics )
 
     def stop(self, ):
-        """ Turn power off to the GPIO pin. """
-        self.inactive = True
+        """ Stop sampling, drop the pending deadline and close the kernel files. """
+        with self.lock:
+            self.inactive = True
+            if self.timer is not None:
+                self.scheduler.cancel( self.timer )
+                self.timer = None
+            if self.sampler is not None:
+                self.sampler.close()
+                self.sampler = None
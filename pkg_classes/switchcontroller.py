@@ -26,9 +26,12 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import collections
 import threading
 import time
-import RPi.GPIO as GPIO
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.metricsmodel import histogram
+from pkg_classes.statefilemodel import SWITCH
 
 # constants for on/off topics and light interval before turning off
 
@@ -37,65 +40,164 @@ OFF_STATE = "OFF"
 
 SWITCH_INTERVAL = 5 * 60 # 5 minute interval timer
 
-LOCK = threading.Lock()
+LOCK_WAIT = histogram("switch_lock_wait_seconds", "Wait for the switch lock")
+GPIO_WRITE = histogram("switch_gpio_write_seconds", "GPIO.output turning a switch on")
 
 class SwitchController:
-    """ Abstract and manage an switch GPIO pin. """
+    """ Abstract and manage an switch GPIO pin. State changes are made under the
+        lock of the switch and published after it is released, in order.
+    """
 
-    def __init__(self, pin=17, interval=SWITCH_INTERVAL):
-        """ Initialize the alarm GPIO pin.  """
+    def __init__(self, pin=17, interval=SWITCH_INTERVAL, saved=None):
+        """ Initialize the alarm GPIO pin. A switch the saved state file has on
+            is set up on, with its last motion and hold, so a restart never
+            drops the light.
+        """
         self.switch_pin = pin
+        self.saved = saved
+        restored = saved.restore(SWITCH, pin) if saved is not None else None
+        on = restored is not None and restored[0] == 1
         GPIO.setmode(GPIO.BCM)  # Broadcom pin-numbering scheme
-        GPIO.setup(self.switch_pin, GPIO.OUT,)
-        GPIO.output(self.switch_pin, GPIO.LOW)
-        self.state = OFF_STATE
-        self.last_motion = 0.0
+        GPIO.setup(self.switch_pin, GPIO.OUT, initial=GPIO.HIGH if on else GPIO.LOW)
+        self.state = ON_STATE if on else OFF_STATE
+        self.last_motion = restored[1] if on else 0.0
         self.interval = interval
+        self.hold = restored[2] if on else interval
         self.switch_topic = ""
+        self.scheduler = None
+        self.timer = None
+        self.lock = threading.Lock()
+        self.events = collections.deque() # states waiting to be published
+        self.publishing = False # a thread is draining events
 
     def set_mqtt_topic(self, client, topic):
         """ set the switch status topic and prepare for publish """
         self.client = client
         self.switch_topic = topic
 
-    def start(self,):
-        """ Start the switch interval timer thread """
-        self.active = True
-        led_thread = threading.Thread(target=self.manage_switch, args=())
-        led_thread.daemon = True
-        led_thread.start()
+    def acquire(self, ):
+        """ Take the lock, timing the wait """
+        start = time.monotonic()
+        self.lock.acquire()
+        LOCK_WAIT.observe(time.monotonic() - start)
 
-    def manage_switch(self):
-        """ sleep and then test for expired timer """
-        while self.active:
-            LOCK.acquire()
+    def release(self, ):
+        """ Release the lock, then publish any state changes it queued """
+        drain = False
+        if self.events and not self.publishing:
+            self.publishing = True
+            drain = True
+        self.lock.release()
+        if drain:
+            self.publish_events()
+
+    def changed(self, state):
+        """ Record the new state and queue it for publishing, lock must be held """
+        self.state = state
+        if len(self.switch_topic) > 0:
+            self.events.append(state)
+
+    def save(self, ):
+        """ Write state, last motion and hold to the state file, lock must be held """
+        if self.saved is not None:
+            self.saved.save(SWITCH, self.switch_pin, 1 if self.state == ON_STATE else 0,
+                            self.last_motion, self.hold)
+
+    def publish_events(self, ):
+        """ Publish queued states oldest first. Only one thread drains at a time and
+            it also sends states queued by others meanwhile, so order is kept and
+            nobody waits on the network while holding the lock.
+        """
+        while True:
+            with self.lock:
+                if not self.events:
+                    self.publishing = False
+                    return
+                state = self.events.popleft()
+            try:
+                self.client.publish(self.switch_topic, state, 0, True)
+            except Exception:
+                # let the next state change drain what is left
+                with self.lock:
+                    self.publishing = False
+                raise
+
+    def start(self, scheduler):
+        """ Register the switch interval timer with the shared scheduler and
+            publish the state, restored or not, as retained
+        """
+        self.acquire()
+        self.scheduler = scheduler
+        if self.state == ON_STATE:
+            self.schedule_off()
+        self.changed(self.state)
+        self.release()
+
+    def set_interval(self, interval):
+        """ Change the auto-off interval; a light held for the old interval is
+            held for the new one from its last motion
+        """
+        self.acquire()
+        if self.hold == self.interval:
+            if self.timer is not None and interval < self.hold:
+                self.scheduler.cancel(self.timer)
+                self.timer = None
+            self.hold = interval
             if self.state == ON_STATE:
-                elapsed_time = time.time() - self.last_motion
-                if elapsed_time > self.interval:
-                    GPIO.output(self.switch_pin, GPIO.LOW)
-                    self.state = OFF_STATE
-                    if len(self.switch_topic) > 0:
-                        self.client.publish(self.switch_topic, self.state, 0, True)
-            LOCK.release()
-            time.sleep(5)
-
-    def turn_on_switch(self,):
-        """ step to turn on the switch and message status """
-        LOCK.acquire()
+                self.schedule_off()
+            self.save()
+        self.interval = interval
+        self.release()
+
+    def schedule_off(self):
+        """ Set a deadline at last motion plus interval, lock must be held """
+        if self.scheduler is not None and self.timer is None:
+            self.timer = self.scheduler.call_at(self.last_motion + self.hold,
+                                                self.manage_switch)
+
+    def manage_switch(self):
+        """ deadline reached, turn off unless motion has moved it out """
+        self.acquire()
+        self.timer = None
+        if self.state == ON_STATE:
+            elapsed_time = time.monotonic() - self.last_motion
+            if elapsed_time >= self.hold:
+                GPIO.output(self.switch_pin, GPIO.LOW)
+                self.changed(OFF_STATE)
+                self.save()
+            else:
+                self.schedule_off()
+        self.release()
+
+    def turn_on_switch(self, hold=None):
+        """ step to turn on the switch and message status, off after hold seconds
+            or the interval
+        """
+        self.acquire()
+        self.last_motion = time.monotonic()
+        hold = self.interval if hold is None else hold
+        if self.timer is not None and hold < self.hold:
+            # the pending deadline is too late for a shorter hold
+            self.scheduler.cancel(self.timer)
+            self.timer = None
+        self.hold = hold
         if self.state == OFF_STATE:
+            start = time.monotonic()
             GPIO.output(self.switch_pin, GPIO.HIGH)
-            self.state = ON_STATE
-            if len(self.switch_topic) > 0:
-                self.client.publish(self.switch_topic, self.state, 0, True)
-        self.last_motion = time.time()
-        LOCK.release()
+            GPIO_WRITE.observe(time.monotonic() - start)
+            self.changed(ON_STATE)
+        self.schedule_off()
+        self.save()
+        self.release()
 
     def turn_off_switch(self,):
         """ step to turn off the switch and message status """
-        LOCK.acquire()
+        self.acquire()
+        if self.timer is not None:
+            self.scheduler.cancel(self.timer)
+            self.timer = None
         if self.state == ON_STATE:
-            self.state = OFF_STATE
             GPIO.output(self.switch_pin, GPIO.LOW)
-            if len(self.switch_topic) > 0:
-                self.client.publish(self.switch_topic, self.state, 0, True)
-        LOCK.release()
+            self.changed(OFF_STATE)
+            self.save()
+        self.release()
@@ -23,20 +23,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-import logging.config
+import logging
 
 class TestModel:
     """ Manage all diy/system/test topic messages
     """
 
-    def __init__(self, controller):
-        """ Create two topics for this application. """
-        logging.config.fileConfig(fname="/usr/local/switch/logging.ini",
-                                  disable_existing_loggers=False)
-        # Get the logger specified in the file
+    def __init__(self, controllers, selftest=None):
+        """ Create two topics for this application. RUN starts the self test,
+            RUN RELAY also toggles the relays that are off.
+        """
         self.logger = logging.getLogger(__name__)
         self.logger.info("Switch Test Model started")
-        self.controller = controller
+        self.controllers = controllers
+        self.selftest = selftest
         self.options = {
             b'0' : self.off,
             b'1': self.no_op,
@@ -49,22 +49,34 @@ class TestModel:
             b'9': self.no_op,
             b'8': self.no_op,
             b'ON' : self.on,
-            b'OFF': self.off
+            b'OFF': self.off,
+            b'RUN': self.run,
+            b'RUN RELAY': self.run_relay
         }
 
     def no_op(self):
         self.logger.info("Tilt: not a valid msg")
 
     def on(self):
-        self.controller.turn_on_switch()
+        for controller in self.controllers:
+            controller.turn_on_switch()
         self.logger.info("case 5: ON switch on")
 
     def off(self):
-        self.controller.turn_off_switch()
+        for controller in self.controllers:
+            controller.turn_off_switch()
         self.logger.info("case 6: OFF switch off")
 
+    def run(self):
+        if self.selftest is not None:
+            self.selftest.run()
+
+    def run_relay(self):
+        if self.selftest is not None:
+            self.selftest.run(relay=True)
+
     def on_message(self, msg):
-        print("test message> ", msg)
-        self.options[msg]()
+        self.logger.debug("test message> %s", msg)
+        self.options.get(msg, self.no_op)()
         self.logger.info("handle diy/system/test message")
 
@@ -34,10 +34,22 @@ class TopicModel:
         """ Create two topics for this application. """
         host_name = socket.gethostname()
         self.status_topic = 'diy/'+host_name+'/status'
+        self.publisher_topic = 'diy/'+host_name+'/publisher'
+        self.broker_topic = 'diy/'+host_name+'/broker'
+        self.metrics_topic = 'diy/'+host_name+'/metrics'
+        self.snapshot_topic = 'diy/'+host_name+'/snapshot'
+        self.config_topic = 'diy/'+host_name+'/config'
+        self.config_status_topic = self.config_topic + '/status'
+        self.test_topic = 'diy/'+host_name+'/test'
         self.switch_status_topic = ''
         self.switch_topic = ''
         self.location_topic = ''
         self.motion_topic = ''
+        self.motion_counters_topic = ''
+        self.motion_query_topic = ''
+        self.motion_history_topic = ''
+        self.rules_topic = ''
+        self.rules_counters_topic = ''
 
     def set(self, location):
         """ The location topic is typically returned by MQTT message methods at startup. """
@@ -45,11 +57,44 @@ class TopicModel:
         self.switch_topic = location + '/switch'
         self.switch_status_topic = self.switch_topic + '/status'
         self.motion_topic = location + '/motion'
+        self.motion_counters_topic = self.motion_topic + '/counters'
+        self.motion_query_topic = self.motion_topic + '/query'
+        self.motion_history_topic = self.motion_topic + '/history'
+        self.rules_topic = location + '/rules'
+        self.rules_counters_topic = self.rules_topic + '/counters'
 
     def get_status(self,):
         """ Typically used in response to MQTT diy/system/who message. """
         return self.status_topic
 
+    def get_publisher(self,):
+        """ Outbound publish counters of the device. """
+        return self.publisher_topic
+
+    def get_snapshot(self,):
+        """ Whole device state in one JSON or CBOR message. """
+        return self.snapshot_topic
+
+    def get_metrics(self,):
+        """ Hot path latency histograms of the device. """
+        return self.metrics_topic
+
+    def get_broker(self,):
+        """ Current broker, failovers and time to reconnect of the device. """
+        return self.broker_topic
+
+    def get_config(self,):
+        """ Retained zone sections laid over the zone file at runtime. """
+        return self.config_topic
+
+    def get_config_status(self,):
+        """ Outcome of the last configuration reload. """
+        return self.config_status_topic
+
+    def get_test(self,):
+        """ Self test report of the device. """
+        return self.test_topic
+
     def get_switch(self,):
         """ Typically used in response to MQTT diy/system/who message. """
         return self.switch_topic
@@ -62,6 +107,26 @@ class TopicModel:
         """ Typically used in response to MQTT diy/system/who message. """
         return self.motion_topic
 
+    def get_motion_counters(self,):
+        """ Raw PIR edges against reported readings, for tuning the sensor. """
+        return self.motion_counters_topic
+
+    def get_motion_query(self,):
+        """ Requests for motion history aggregates. """
+        return self.motion_query_topic
+
+    def get_motion_history(self,):
+        """ Default reply topic for motion history queries. """
+        return self.motion_history_topic
+
+    def get_rules(self,):
+        """ Retained JSON rules evaluated on the device. """
+        return self.rules_topic
+
+    def get_rules_counters(self,):
+        """ Rules loaded and fired. """
+        return self.rules_counters_topic
+
     def get_location(self,):
         """ The location topic is used to manage multiple devices. """
         return self.location_topic
\ No newline at end of file
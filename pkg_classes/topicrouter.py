@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+""" DIYHA Topic Router:
+    Dispatch MQTT messages to handlers compiled once for exact and wildcard topics.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+
+from pkg_classes import metricsmodel
+
+WILDCARD_LEVEL = '+'
+WILDCARD_TAIL = '#'
+
+HANDLER_ERRORS = metricsmodel.counter("mqtt_handler_errors_total",
+                                      "message handlers that raised, caught by the router")
+
+
+class TopicRouter:
+    """ Exact topics resolve with one dictionary lookup, + and # topics through a trie. """
+
+    def __init__(self, ):
+        """ Start with no routes. """
+        self.logger = logging.getLogger(__name__)
+        self.exact = {}
+        self.trie = {}
+        self.has_wildcards = False
+        self.routed = 0
+        self.dropped = 0
+
+    def add(self, topic, handler):
+        """ Route messages on topic, which may contain + and #, to handler(client, msg). """
+        if WILDCARD_LEVEL not in topic and WILDCARD_TAIL not in topic:
+            self.exact[topic] = handler
+            return
+        node = self.trie
+        for level in topic.split('/'):
+            node = node.setdefault(level, {})
+        node[None] = handler
+        self.has_wildcards = True
+
+    def remove(self, topic):
+        """ Drop the route for topic; empty trie branches are left in place. """
+        if topic in self.exact:
+            del self.exact[topic]
+            return
+        node = self.trie
+        for level in topic.split('/'):
+            node = node.get(level)
+            if node is None:
+                return
+        node.pop(None, None)
+
+    def lookup(self, topic):
+        """ The handler for a concrete topic, an exact route first, or None. """
+        handler = self.exact.get(topic)
+        if handler is None and self.has_wildcards:
+            handler = self.match(self.trie, topic.split('/'), 0)
+        return handler
+
+    def match(self, node, levels, index):
+        """ Depth first trie walk preferring literal levels over + over #. """
+        if index == len(levels):
+            handler = node.get(None)
+            if handler is None and WILDCARD_TAIL in node:
+                handler = node[WILDCARD_TAIL].get(None)
+            return handler
+        child = node.get(levels[index])
+        if child is not None:
+            handler = self.match(child, levels, index + 1)
+            if handler is not None:
+                return handler
+        child = node.get(WILDCARD_LEVEL)
+        if child is not None:
+            handler = self.match(child, levels, index + 1)
+            if handler is not None:
+                return handler
+        child = node.get(WILDCARD_TAIL)
+        if child is not None:
+            return child.get(None)
+        return None
+
+    def dispatch(self, client, msg):
+        """ paho on_message body: run the handler or count the drop. A handler
+            that raises is logged and counted, the paho thread carries on.
+        """
+        handler = self.lookup(msg.topic)
+        if handler is None:
+            self.dropped += 1
+            self.logger.debug("Dropped unrouted topic %s", msg.topic)
+            return False
+        self.routed += 1
+        try:
+            handler(client, msg)
+        except Exception:  # pylint: disable=broad-except
+            HANDLER_ERRORS.inc()
+            self.logger.exception("Handler failed for topic %s", msg.topic)
+        return True
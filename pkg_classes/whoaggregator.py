@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+
+""" DIYHA Who Aggregator:
+    Ask every device who it is and collect the replies into one inventory.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import json
+import threading
+import time
+from pkg_classes.whocontroller import STATUS_TOPIC, WHO_SPREAD
+
+WHO_TOPIC = "diy/system/who"
+REPLY_TOPIC = STATUS_TOPIC + "/+"
+
+
+class WhoAggregator:
+    """ Collect diy/system/status/<host> replies on an already connected client. """
+
+    def __init__(self, client, timeout=WHO_SPREAD + 2.0, expect=0):
+        """ Finish after timeout seconds, or once expect devices replied. """
+        self.client = client
+        self.timeout = timeout
+        self.expect = expect
+        self.inventory = {}
+        self.lock = threading.Lock()
+        self.complete = threading.Event()
+        self.elapsed = 0.0
+
+    def on_reply(self, client, userdata, msg):
+        """ One device reply; older firmware replies with a bare host name. """
+        # pylint: disable=unused-argument
+        host = msg.topic.rsplit('/', 1)[1]
+        try:
+            details = json.loads(msg.payload)
+        except ValueError:
+            details = {"host": msg.payload.decode('utf-8', 'replace')}
+        with self.lock:
+            self.inventory[host] = details
+            if self.expect and len(self.inventory) >= self.expect:
+                self.complete.set()
+
+    def collect(self, ):
+        """ Send diy/system/who ON and return {host: details} when complete;
+            elapsed is then the seconds it took.
+        """
+        self.client.message_callback_add(REPLY_TOPIC, self.on_reply)
+        self.client.subscribe(REPLY_TOPIC, 1)
+        start = time.monotonic()
+        self.client.publish(WHO_TOPIC, "ON", 1, False)
+        self.complete.wait(self.timeout)
+        self.client.unsubscribe(REPLY_TOPIC)
+        self.client.message_callback_remove(REPLY_TOPIC)
+        with self.lock:
+            inventory = dict(self.inventory)
+        self.elapsed = time.monotonic() - start
+        return inventory
@@ -23,23 +23,32 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import json
+import random
 import socket
 import logging
-import logging.config
+import time
+
+WHO_SPREAD = 3.0 # seconds over which a fleet of devices spreads its replies
+STATUS_TOPIC = "diy/system/status"
 
 class WhoController:
     """ Who controller handles  MQTT broker messsages for diy/system/who ON or OFF.
+        Each device replies on diy/system/status/<host> after a random delay
+        so a house full of devices does not answer in one burst.
     """
 
-    def __init__(self,):
+    def __init__(self, spread=WHO_SPREAD):
         """ Create two topics for this application. """
-        logging.config.fileConfig(fname='/usr/local/switch/logging.ini',
-                                  disable_existing_loggers=False)
-        # Get the logger specified in the file
         self.logger = logging.getLogger(__name__)
         host_name = socket.gethostname()
         self.default_who_message = host_name
-        self.status_topic = "diy/system/status"
+        self.status_topic = STATUS_TOPIC + "/" + host_name
+        self.details = {"host": host_name}
+        self.spread = spread
+        self.started = time.monotonic()
+        self.scheduler = None
+        self.timer = None
         self.waiting_for_client = True
         self.logger.info('Waiting for client initialization: '+self.default_who_message)
 
@@ -55,15 +64,33 @@ class WhoController:
     def set_message(self, message):
         """ Typically used by MQTT subscribe methods. """
         self.default_who_message = message
+        self.details["host"] = message
         self.logger.info("Default message changed")
 
+    def set_details(self, details):
+        """ Topics, mode and other facts sent in every reply. """
+        self.details.update(details)
+
+    def start(self, scheduler):
+        """ Spread replies with the shared scheduler """
+        self.scheduler = scheduler
+
+    def reply(self, ):
+        """ Publish the details with the service uptime in one compact message. """
+        self.timer = None
+        message = dict(self.details, uptime=round(time.monotonic() - self.started))
+        self.client.publish(self.status_topic, json.dumps(message, separators=(',', ':')),
+                            0, False)
+
     def turn_on(self,):
         """  Response to MQTT diy/system/who message. """
-        self.logger.info("Received diy/system/who ON, publish> "+self.default_who_message)
-        if not self.waiting_for_client:
-            self.client.publish(self.status_topic, self.default_who_message, 0, True)
-        else:
+        self.logger.info("Received diy/system/who ON, reply on "+self.status_topic)
+        if self.waiting_for_client:
             self.logger.error("Client not initialized")
+        elif self.scheduler is None:
+            self.reply()
+        elif self.timer is None:
+            self.timer = self.scheduler.call_later(random.uniform(0.0, self.spread), self.reply)
 
     def turn_off(self,):
         """  Response to MQTT diy/system/who message. """
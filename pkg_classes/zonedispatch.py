@@ -0,0 +1,94 @@
+#!/usr/bin/python3
+
+""" DIYHA Zone Dispatch:
+    How a zone answers its switch topic, its rule topics and its PIR readings; shared
+    by switch.py, the fleet simulator and the benchmarks.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import time
+
+from pkg_classes import metricsmodel
+
+EDGE_TO_PUBLISH = metricsmodel.histogram("motion_edge_to_publish_seconds",
+                                         "PIR edge to the motion publish handed to paho")
+
+
+def switch_message(zone):
+    """ Handler for a zone switch topic command. """
+    def handler(client, msg):
+        # pylint: disable=unused-argument
+        if msg.payload == b'ON':
+            zone.switch.turn_on_switch()
+        else:
+            zone.switch.turn_off_switch()
+    return handler
+
+
+def apply_rule(zone, result):
+    """ Drive the zone switch from a matched rule's (action, seconds). """
+    action, hold = result
+    if action == "on":
+        zone.switch.turn_on_switch(hold)
+    else:
+        zone.switch.turn_off_switch()
+
+
+def rule_message(zones):
+    """ Handler for a topic some zone has a rule for; act locally, the switch
+        reports afterwards.
+    """
+    def handler(client, msg):
+        # pylint: disable=unused-argument
+        for zone in zones:
+            result = zone.rules.evaluate(msg.topic, msg.payload)
+            if result is not None:
+                apply_rule(zone, result)
+    return handler
+
+
+def motion_message(zone, movement, publisher):
+    """ Drive the zone switch by its rules, or else its mode, then publish the
+        motion change.
+    """
+    if movement == "1":
+        result = zone.rules.evaluate("motion")
+        if result is not None:
+            apply_rule(zone, result)
+        elif zone.get_mode() == "motion":
+            zone.switch.turn_on_switch()
+        else:
+            if zone.switch.state == "ON":
+                zone.switch.turn_on_switch()
+    publisher.publish(zone.topic.get_motion(), movement, 0, True)
+    if zone.motion.edge_time is not None:
+        EDGE_TO_PUBLISH.observe(time.monotonic() - zone.motion.edge_time)
+
+
+def drain_motion(zone, publisher):
+    """ Handle every queued motion reading of a zone. """
+    while zone.motion.detected():
+        movement = zone.motion.get_motion()
+        if movement is not None:
+            motion_message(zone, movement, publisher)
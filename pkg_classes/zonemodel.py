@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+
+""" DIYHA Zone Model:
+    One location served by a switch relay, a PIR sensor and their MQTT topics.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from pkg_classes.motioncontroller import MotionController
+from pkg_classes.historymodel import HISTORY_SIZE
+from pkg_classes.switchcontroller import SwitchController, SWITCH_INTERVAL
+from pkg_classes.topicmodel import TopicModel
+from pkg_classes.rulemodel import RuleModel
+
+
+class ZoneModel:
+    """ Group the controllers and topics of one location. """
+
+    def __init__(self, location, switch_pin, motion_pin, mode='motion', interval=SWITCH_INTERVAL,
+                 rise_hold=0.0, fall_hold=0.0, max_rate=0.0, history=HISTORY_SIZE,
+                 name='switch', saved=None):
+        """ Set up the location topics, relay and debounced PIR sensor. name is
+            the zone file section, reloads find the zone by it. saved is the state
+            file the relay is restored from.
+        """
+        self.name = name
+        self.topic = TopicModel()
+        self.topic.set(location)
+        self.mode = mode
+        self.history = history
+        self.switch = SwitchController(switch_pin, interval, saved)
+        self.motion = MotionController(motion_pin, rise_hold, fall_hold, max_rate, history)
+        self.rules = RuleModel()
+        self.initial = self.get_settings()
+
+    def get_settings(self, ):
+        """ The zone's keyword arguments as they are now. """
+        return {'location': self.get_location(), 'switch_pin': self.switch.switch_pin,
+                'motion_pin': self.motion.pir_pin, 'mode': self.mode,
+                'interval': self.switch.interval, 'rise_hold': self.motion.rise_hold,
+                'fall_hold': self.motion.fall_hold, 'max_rate': self.motion.max_rate,
+                'history': self.history}
+
+    def plan(self, settings):
+        """ Changes that bring the zone to settings, keys left out keeping their
+            startup value; ValueError for changes that need a restart.
+        """
+        wanted = dict(self.initial)
+        wanted.update(settings)
+        current = self.get_settings()
+        for key, name in (('switch_pin', 'switch'), ('motion_pin', 'motion'),
+                          ('history', 'history')):
+            if wanted[key] != current[key]:
+                raise ValueError("zone " + self.name + ": " + name + " changes need a restart")
+        return {key: value for key, value in wanted.items() if value != current[key]}
+
+    def configure(self, changes):
+        """ Apply planned changes without touching the relay. Returns the old
+            topics when the location moved, otherwise None.
+        """
+        moved = None
+        if 'location' in changes:
+            topic = TopicModel()
+            topic.set(changes['location'])
+            moved, self.topic = self.topic, topic
+        if 'mode' in changes:
+            self.mode = changes['mode']
+        if 'interval' in changes:
+            self.switch.set_interval(changes['interval'])
+        if {'rise_hold', 'fall_hold', 'max_rate'} & set(changes):
+            self.motion.set_debounce(changes.get('rise_hold', self.motion.rise_hold),
+                                     changes.get('fall_hold', self.motion.fall_hold),
+                                     changes.get('max_rate', self.motion.max_rate))
+        return moved
+
+    def get_location(self, ):
+        """ The location topic of the zone. """
+        return self.topic.get_location()
+
+    def get_mode(self, ):
+        """ motion: motion turns the switch on, message: motion only extends it """
+        return self.mode
@@ -25,29 +25,63 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import json
 import logging.config
+import os
+import queue
+import signal
+import threading
 import time
 import paho.mqtt.client as mqtt
 
-from pkg_classes.motioncontroller import MotionController
-from pkg_classes.switchcontroller import SwitchController
 from pkg_classes.testmodel import TestModel
-from pkg_classes.topicmodel import TopicModel
+from pkg_classes.zonemodel import ZoneModel
 from pkg_classes.whocontroller import WhoController
 from pkg_classes.configmodel import ConfigModel
 from pkg_classes.statusmodel import StatusModel
 from pkg_classes.alarmcontroller import AlarmController
+from pkg_classes.schedulercontroller import SchedulerController
+from pkg_classes.topicrouter import TopicRouter
+from pkg_classes.publishcontroller import PublishController
+from pkg_classes.outboxmodel import OutboxModel
+from pkg_classes.loggingmodel import LoggingModel
+from pkg_classes.failovercontroller import FailoverController
+from pkg_classes import metricsmodel
+from pkg_classes.snapshotcontroller import SnapshotController, parse_stats
+from pkg_classes.statefilemodel import StateFileModel
+from pkg_classes.selftestcontroller import SelfTestController
+from pkg_classes.zonedispatch import switch_message, rule_message, drain_motion
 
-# Constants for GPIO pins
+
+def process_age():
+    """ Seconds since the kernel started this process, interpreter startup included. """
+    with open("/proc/self/stat") as stat:
+        start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+    with open("/proc/uptime") as uptime:
+        up_seconds = float(uptime.read().split()[0])
+    return up_seconds - start_ticks / os.sysconf("SC_CLK_TCK")
+
+
+STARTUP = {"imports": process_age()}
+
+# Constants for GPIO pins, used when a single --location is served
 
 SWITCH_GPIO = 23
 MOTION_GPIO = 24
 ALARM_GPIO = 25
 
+COUNTERS_INTERVAL = 15 * 60 # seconds between motion and publisher counter reports
+ZONES_POLL = 5.0 # seconds between checks of the zone file for changes
+LOG_COUNTERS = {"dropped": 0, "limited": 0} # last reported logging losses
+
+CALLBACK = metricsmodel.histogram("mqtt_callback_seconds", "paho on_message callback")
+
 # Start logging and enable imported classes to log appropriately.
 
 logging.config.fileConfig(fname="/usr/local/switch/logging.ini",
                           disable_existing_loggers=False)
+LOG_PIPELINE = LoggingModel()  # file writes happen on a background thread
+LOG_PIPELINE.start()
 LOGGER = logging.getLogger("switch")
 LOGGER.info('Application started')
 
@@ -55,96 +89,338 @@ LOGGER.info('Application started')
 
 CONFIG = ConfigModel()
 
-# Location is used to create the switch topics
+# Switch and alarm state a previous process left, restored before any GPIO write
+
+STATE_FILE = StateFileModel(CONFIG.get_state()) if CONFIG.get_state() else None
+
+# One monotonic deadline thread, or the asyncio loop, serves the switch, alarm
+# and status timers
 
-TOPIC = TopicModel()  # Location MQTT topic
-TOPIC.set(CONFIG.get_location())
+if CONFIG.get_runtime() == "asyncio":
+    # pylint: disable=wrong-import-position
+    import asyncio
+    from pkg_classes.asynciohelper import AsyncioHelper
+    from pkg_classes.schedulercontroller import AsyncSchedulerController
+    LOOP = asyncio.new_event_loop()
+    SCHEDULER = AsyncSchedulerController(LOOP)
+else:
+    SCHEDULER = SchedulerController()
+SCHEDULER.start()
 
 # Set up who message handler from MQTT broker and wait for client.
 
-WHO = WhoController()
+WHO = WhoController(CONFIG.get_who_spread())
+WHO.start(SCHEDULER)
+
+# Each zone is a location with its own switch and motion controllers and topics
+
+if CONFIG.get_zones():
+    ZONES = [ZoneModel(saved=STATE_FILE, **zone) for zone in CONFIG.get_zones()]
+else:
+    ZONES = [ZoneModel(CONFIG.get_location(), SWITCH_GPIO, MOTION_GPIO, CONFIG.get_mode(),
+                       history=CONFIG.get_history(), saved=STATE_FILE,
+                       **CONFIG.get_debounce())]
 
-# set up switch GPIO controller to power on/off and with interval timer
+# who replies describe every zone and the device topics
 
-SWITCH = SwitchController(SWITCH_GPIO)  # Alarm or light controller
+def who_details():
+    """ Zones and device topics for who replies, rebuilt after a reload. """
+    details = {"mode": ZONES[0].get_mode(),
+               "zones": [{"location": zone.get_location(), "mode": zone.get_mode(),
+                          "switch": zone.topic.get_switch(),
+                          "motion": zone.topic.get_motion()} for zone in ZONES],
+               "topics": {"status": ZONES[0].topic.get_status(),
+                          "metrics": ZONES[0].topic.get_metrics(),
+                          "config": ZONES[0].topic.get_config(),
+                          "test": ZONES[0].topic.get_test()}}
+    if CONFIG.get_snapshot() != "off":
+        details["topics"]["snapshot"] = ZONES[0].topic.get_snapshot()
+    return details
 
-# set up the motion controller using a PIR sensor
 
-MOTION = MotionController(MOTION_GPIO)
+WHO.set_details(who_details())
+
+# Zones with motion readings waiting, None stops the motion loop
+
+MOTION_QUEUE = queue.Queue()
 
 # set up the alarm controller 
 
-ALARM = AlarmController(ALARM_GPIO)
-ALARM.start()
+ALARM = AlarmController(ALARM_GPIO, saved=STATE_FILE)
+ALARM.set_patterns(*CONFIG.get_patterns())
+ALARM.start(SCHEDULER)
 
-# process diy/system/test development messages
+# process diy/system/test development messages; RUN reports a self test on
+# diy/<host>/test
 
-TEST = TestModel(SWITCH)
+SELFTEST = SelfTestController(ZONES, ZONES[0].topic.get_test())
+SELFTEST.start(SCHEDULER)
+TEST = TestModel([zone.switch for zone in ZONES], SELFTEST)
 
 # Process MQTT messages using a dispatch table algorithm.
 
-def system_message(client, msg):
-    """ Log and process system messages. """
+def all_switches_on():
+    """ Fire and panic light every zone. """
+    for zone in ZONES:
+        zone.switch.turn_on_switch()
+
+
+def all_switches_off():
+    """ Fire and panic cleared. """
+    for zone in ZONES:
+        zone.switch.turn_off_switch()
+
+
+def fire_message(client, msg):
+    """ diy/system/fire: every light on and the alarm sounding the fire cadence. """
+    # pylint: disable=unused-argument
+    LOGGER.debug("%s %s", msg.topic, msg.payload)
+    if msg.payload == b'ON':
+        all_switches_on()
+        ALARM.sound_alarm(True)
+    else:
+        all_switches_off()
+        ALARM.sound_alarm(False)
+
+
+def panic_message(client, msg):
+    """ diy/system/panic: every light on and the alarm sounding the panic cadence. """
+    # pylint: disable=unused-argument
+    LOGGER.debug("%s %s", msg.topic, msg.payload)
+    if msg.payload == b'ON':
+        all_switches_on()
+        ALARM.sound_pulsing_alarm(True)
+    else:
+        all_switches_off()
+        ALARM.sound_pulsing_alarm(False)
+
+
+def test_message(client, msg):
+    """ diy/system/test development messages. """
     # pylint: disable=unused-argument
-    LOGGER.info(msg.topic + " " + msg.payload.decode('utf-8'))
-    if msg.topic == 'diy/system/fire':
-        if msg.payload == b'ON':
-            SWITCH.turn_on_switch()
-            ALARM.sound_alarm(True)
-        else:
-            SWITCH.turn_off_switch()
-            ALARM.sound_alarm(False)
-    elif msg.topic == 'diy/system/panic':
-        if msg.payload == b'ON':
-            SWITCH.turn_on_switch()
-            ALARM.sound_pulsing_alarm(True)
-        else:
-            SWITCH.turn_off_switch()
-            ALARM.sound_pulsing_alarm(False)
-    elif msg.topic == 'diy/system/test':
-        TEST.on_message(msg.payload)
-    elif msg.topic == 'diy/system/who':
-        if msg.payload == b'ON':
-            WHO.turn_on()
-        else:
-            WHO.turn_off()
-
-
-#  A dictionary dispatch table is used to parse and execute MQTT messages.
-
-TOPIC_DISPATCH_DICTIONARY = {
-    "diy/system/fire":
-        {"method": system_message},
-    "diy/system/panic":
-        {"method": system_message},
-    "diy/system/test":
-        {"method": system_message},
-    "diy/system/who":
-        {"method": system_message}
-}
+    TEST.on_message(msg.payload)
+
+
+def who_message(client, msg):
+    """ diy/system/who discovery. """
+    # pylint: disable=unused-argument
+    if msg.payload == b'ON':
+        WHO.turn_on()
+    else:
+        WHO.turn_off()
+
+
+def history_message(zone):
+    """ Handler for a zone motion history query, answered on the request's
+        reply topic or <location>/motion/history.
+    """
+    def handler(client, msg):
+        try:
+            request = json.loads(msg.payload)
+            topic = request.get("reply", zone.topic.get_motion_history())
+            if not isinstance(topic, str) or not topic or "+" in topic or "#" in topic:
+                raise ValueError("reply must be a topic without wildcards")
+            reply = zone.motion.history.query(request)
+            client.publish(topic, json.dumps(reply), 1, False)
+        except (ValueError, KeyError, TypeError, AttributeError) as error:
+            LOGGER.error("Bad history query: " + str(error))
+    return handler
+
+
+def rules_message(zone):
+    """ Handler for a zone's retained rules topic. """
+    def handler(client, msg):
+        if zone.rules.load(msg.payload):
+            with ROUTES_LOCK:
+                route_rule_topics(client)
+    return handler
+
+
+def route_rule_topics(client):
+    """ Subscribe topics new rules trigger on and drop those no rule uses any more;
+        ROUTES_LOCK must be held.
+    """
+    wanted = set()
+    for zone in ZONES:
+        wanted |= zone.rules.get_topics()
+    for topic in RULE_TOPICS - wanted:
+        ROUTER.remove(topic)
+        client.unsubscribe(topic)
+        RULE_TOPICS.discard(topic)
+    for topic in wanted - RULE_TOPICS:
+        if ROUTER.lookup(topic) is not None:
+            LOGGER.warning("Rule topic already routed: " + topic)
+            continue
+        ROUTER.add(topic, rule_message(ZONES))
+        client.subscribe(topic, 1)
+        RULE_TOPICS.add(topic)
+
+
+def config_message(client, msg):
+    """ Retained zone sections for this device, laid over the zone file. A
+        payload that does not check out is ignored and the last good one kept.
+    """
+    try:
+        text = msg.payload.decode('utf-8')
+    except UnicodeDecodeError:
+        LOGGER.error("Config rejected> not UTF-8 text")
+        return
+    reload_config(client, text)
+
+
+def reload_config(client, text=None):
+    """ Check the zone file and config topic against every zone first, then
+        apply them to every zone, or to none. The relays keep their state and only
+        the topics of a zone that moved are routed and subscribed again. text is
+        a new config topic payload, kept only once it has been applied.
+    """
+    status = ZONES[0].topic.get_config_status()
+    with ROUTES_LOCK:
+        try:
+            settings = CONFIG.read_config(text)
+            unknown = set(settings) - set(zone.name for zone in ZONES)
+            if unknown:
+                raise ValueError("zones are added with a restart: " +
+                                 ", ".join(sorted(unknown)))
+            plans = [(zone, zone.plan(settings.get(zone.name, {}))) for zone in ZONES]
+            locations = [changes.get("location", zone.get_location())
+                         for zone, changes in plans]
+            if len(set(locations)) != len(locations):
+                raise ValueError("two zones share a location")
+        except ValueError as error:
+            LOGGER.error("Config rejected> " + str(error))
+            PUBLISHER.publish(status, "rejected " + str(error), 1, True)
+            return
+        if text is not None:
+            CONFIG.set_config_text(text)
+        applied = []
+        for zone, changes in plans:
+            if not changes:
+                continue
+            moved = zone.configure(changes)
+            if moved is not None:
+                relocate(client, zone, moved)
+            applied.append(zone.name + " " + " ".join(
+                key + "=" + str(value) for key, value in sorted(changes.items())))
+    if applied:
+        WHO.set_details(who_details())
+        LOGGER.info("Config applied> " + "; ".join(applied))
+    PUBLISHER.publish(status, "applied " + ("; ".join(applied) or "no changes"), 1, True)
+
+
+def route_zone(zone):
+    """ Route the command, rules and history query topics of a zone. """
+    ROUTER.add(zone.topic.get_switch(), switch_message(zone))
+    ROUTER.add(zone.topic.get_rules(), rules_message(zone))
+    ROUTER.add(zone.topic.get_motion_query(), history_message(zone))
+
+
+def relocate(client, zone, old):
+    """ Move a zone from its old topics: routes and subscriptions follow, the
+        rules of the old location are dropped until the new location's arrive, and
+        the switch and motion state are published at the new location.
+    """
+    for topic in (old.get_switch(), old.get_rules(), old.get_motion_query()):
+        ROUTER.remove(topic)
+    client.unsubscribe([old.get_rules(), old.get_motion_query()])
+    route_zone(zone)
+    client.subscribe([(zone.topic.get_rules(), 1), (zone.topic.get_motion_query(), 1)])
+    zone.rules.load(b'')
+    route_rule_topics(client)
+    zone.switch.set_mqtt_topic(STATE, zone.topic.get_switch())
+    if SNAPSHOT is not None:
+        SNAPSHOT.untrack(old.get_switch())
+        SNAPSHOT.untrack(old.get_motion())
+        SNAPSHOT.track(zone.topic.get_switch(), ("zones", zone.get_location(), "switch"))
+        SNAPSHOT.track(zone.topic.get_motion(), ("zones", zone.get_location(), "motion"))
+    STATE.publish(zone.topic.get_switch(), zone.switch.state, 0, True)
+    STATE.publish(zone.topic.get_motion(), str(zone.motion.emitted), 0, True)
+
+
+def watch_zones_file(stamp=None):
+    """ Reload when the zone file's modification time changes, then check again;
+        the first call only notes the time.
+    """
+    try:
+        current = os.stat(CONFIG.get_zones_file()).st_mtime_ns
+    except OSError:
+        current = stamp # mid save or removed, keep running on what was read
+    if stamp is not None and current != stamp:
+        reload_config(CLIENT)
+    SCHEDULER.call_later(ZONES_POLL, watch_zones_file, current)
+
+
+#  Routes are compiled once; on_message does a single lookup per message and
+#  counts topics without a route instead of raising.
+
+ROUTER = TopicRouter()
+ROUTER.add("diy/system/fire", fire_message)
+ROUTER.add("diy/system/panic", panic_message)
+ROUTER.add("diy/system/test", test_message)
+ROUTER.add("diy/system/who", who_message)
+ROUTER.add(ZONES[0].topic.get_config(), config_message)
+for ZONE in ZONES:
+    route_zone(ZONE)
+    ZONE.rules.set_site(*CONFIG.get_site())
+
+# Topics that only rules listen to, routed as rule sets arrive. Routes and
+# subscriptions change from the network callbacks and zone file reloads.
+
+RULE_TOPICS = set()
+ROUTES_LOCK = threading.Lock()
 
 
 def on_message(client, userdata, msg):
     """ dispatch to the appropriate MQTT topic handler """
     # pylint: disable=unused-argument
-    if msg.topic == TOPIC.get_switch():
-        if msg.payload == b'ON':
-            SWITCH.turn_on_switch()
-        else:
-            SWITCH.turn_off_switch()
-    else:
-        TOPIC_DISPATCH_DICTIONARY[msg.topic]["method"](client, msg)
+    start = time.monotonic()
+    ROUTER.dispatch(client, msg)
+    CALLBACK.observe(time.monotonic() - start)
 
 
 def on_connect(client, userdata, flags, rc_msg):
     """ Subscribing in on_connect() means that if we lose the connection and
-        reconnect then subscriptions will be renewed.
+        reconnect then subscriptions will be renewed. The first accepted
+        CONNACK starts status monitoring and the switch timers.
     """
     # pylint: disable=unused-argument
+    if rc_msg != 0:
+        LOGGER.error("Connection refused: " + str(rc_msg))
+        return
+    client.connected_flag = True
+    FAILOVER.on_connect()
+    PUBLISHER.on_connect()
     client.subscribe("diy/system/fire", 1)
     client.subscribe("diy/system/panic", 1)
     client.subscribe("diy/system/test", 1)
     client.subscribe("diy/system/who", 1)
+    client.subscribe(ZONES[0].topic.get_config(), 1)
+    with ROUTES_LOCK:
+        for zone in ZONES:
+            client.subscribe(zone.topic.get_rules(), 1)
+            client.subscribe(zone.topic.get_motion_query(), 1)
+        for topic in RULE_TOPICS:
+            client.subscribe(topic, 1)
+    if "connack" not in STARTUP:
+        STARTUP["connack"] = process_age()
+        start_services()
+
+
+def start_services():
+    """ Status monitoring, switch timers and counters once the broker answers. """
+    STATUS.start(SCHEDULER)
+    if SNAPSHOT is not None:
+        SNAPSHOT.start(SCHEDULER)
+    for zone in ZONES:
+        zone.switch.start(SCHEDULER)
+    SCHEDULER.call_later(COUNTERS_INTERVAL, publish_counters)
+    if CONFIG.get_zones_file() is not None:
+        watch_zones_file()
+    STARTUP["ready"] = process_age()
+    if STATE_FILE is not None and STATE_FILE.stopped:
+        # from the previous process's clean stop to this one serving again
+        STARTUP["restart"] = time.monotonic() - STATE_FILE.stopped
+    log_footprint()
 
 
 def on_disconnect(client, userdata, rc_msg):
@@ -152,6 +428,124 @@ def on_disconnect(client, userdata, rc_msg):
     # pylint: disable=unused-argument
     client.connected_flag = False
     client.disconnect_flag = True
+    PUBLISHER.on_disconnect()
+    if rc_msg != 0:
+        FAILOVER.on_disconnect(client)
+
+
+def on_connect_fail(client, userdata):
+    """ Broker unreachable, back off and move to the next one """
+    # pylint: disable=unused-argument
+    LOGGER.error("Connect failed: " + "%s:%d" % FAILOVER.current())
+    FAILOVER.on_connect_fail(client)
+
+
+def publish_counters():
+    """ Publish motion edges and readings per zone and the publisher savings,
+        then reschedule.
+    """
+    for zone in ZONES:
+        counters = zone.motion.get_counters()
+        PUBLISHER.publish(zone.topic.get_motion_counters(),
+                          str(counters["edges"]) + " " + str(counters["events"]), 0, True)
+        counters = zone.rules.get_counters()
+        PUBLISHER.publish(zone.topic.get_rules_counters(),
+                          str(counters["rules"]) + " " + str(counters["fired"]), 0, True)
+    counters = PUBLISHER.get_counters()
+    PUBLISHER.publish(ZONES[0].topic.get_publisher(),
+                      " ".join(key + "=" + str(value) for key, value in counters.items()),
+                      0, True)
+    PUBLISHER.publish(ZONES[0].topic.get_metrics(), json.dumps(metricsmodel.summary()), 0, True)
+    counters = FAILOVER.get_counters()
+    PUBLISHER.publish(ZONES[0].topic.get_broker(),
+                      " ".join(key + "=" + str(value) for key, value in counters.items()),
+                      0, True)
+    log_counters = LOG_PIPELINE.get_counters()
+    if log_counters != LOG_COUNTERS:
+        LOGGER.warning("Log records dropped=" + str(log_counters["dropped"]) +
+                       " rate limited=" + str(log_counters["limited"]))
+        LOG_COUNTERS.update(log_counters)
+    SCHEDULER.call_later(COUNTERS_INTERVAL, publish_counters)
+
+
+def track_snapshot():
+    """ The status, switch and motion topics the snapshot folds in. """
+    SNAPSHOT.update(("host",), STATUS.host)
+    for topic, key in ((STATUS.cpu_topic, "cpu"), (STATUS.celsius_topic, "cpucelsius"),
+                       (STATUS.disk_topic, "disk")):
+        SNAPSHOT.track(topic, (key,), float)
+        SNAPSHOT.track(topic + "/stats", ("stats", key), parse_stats)
+    SNAPSHOT.track(STATUS.os_version_topic, ("os",))
+    SNAPSHOT.track(STATUS.pi_version_topic, ("pi",))
+    SNAPSHOT.track(STATUS.ip_address_topic, ("ip",))
+    for zone in ZONES:
+        SNAPSHOT.track(zone.topic.get_switch(), ("zones", zone.get_location(), "switch"))
+        SNAPSHOT.track(zone.topic.get_motion(), ("zones", zone.get_location(), "motion"))
+
+
+def log_footprint():
+    """ Log startup phases, thread count and resident memory to compare runtimes. """
+    startup = " ".join(phase + "={0:.2f}s".format(age) for phase, age in STARTUP.items())
+    rss = "unknown"
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                rss = line.split(":")[1].strip()
+    LOGGER.info("Runtime " + CONFIG.get_runtime() + ": " + startup + " threads=" +
+                str(threading.active_count()) + " rss=" + rss)
+
+
+def on_terminate(signum, frame):
+    """ systemd stop or ctrl-c: wake the motion loop so it can exit cleanly. """
+    # pylint: disable=unused-argument
+    LOGGER.info("Signal " + str(signum) + " received, shutting down")
+    MOTION_QUEUE.put(None)
+
+
+def run_threads():
+    """ paho network thread and timer thread, motion handled on the main thread. """
+    for zone in ZONES:
+        zone.motion.start(SCHEDULER)
+        zone.motion.set_listener(lambda zone=zone: MOTION_QUEUE.put(zone))
+
+    # paho's thread connects, on_connect_fail moves it through the brokers
+
+    FAILOVER.probe()
+    FAILOVER.connect_async(CLIENT)
+    CLIENT.loop_start()
+
+    # Block on the PIR interrupt queue; no wakeups until an edge arrives
+
+    signal.signal(signal.SIGTERM, on_terminate)
+    signal.signal(signal.SIGINT, on_terminate)
+
+    while True:
+        zone = MOTION_QUEUE.get(True)
+        if zone is None:
+            break
+        drain_motion(zone, STATE)
+
+    CLIENT.disconnect()
+    CLIENT.loop_stop()
+
+
+def run_asyncio():
+    """ MQTT socket, timers and motion readings all run on one event loop. """
+    for zone in ZONES:
+        zone.motion.start(SCHEDULER)
+        zone.motion.set_listener(
+            lambda zone=zone: LOOP.call_soon_threadsafe(drain_motion, zone, STATE))
+
+    helper = AsyncioHelper(LOOP, CLIENT, FAILOVER)
+    helper.start()
+
+    LOOP.add_signal_handler(signal.SIGTERM, LOOP.stop)
+    LOOP.add_signal_handler(signal.SIGINT, LOOP.stop)
+    LOOP.run_forever()
+
+    CLIENT.disconnect()
+    LOOP.run_until_complete(helper.stop())
+    LOOP.close()
 
 
 if __name__ == '__main__':
@@ -162,41 +556,70 @@ if __name__ == '__main__':
     CLIENT.on_connect = on_connect
     CLIENT.on_disconnect = on_disconnect
     CLIENT.on_message = on_message
+    CLIENT.on_connect_fail = on_connect_fail
 
-    # initilze the Who client for publishing.
+    # Fastest reachable broker first, jittered backoff and failover when it is lost
 
-    WHO.set_client(CLIENT)
+    FAILOVER = FailoverController(CONFIG.get_brokers(), CONFIG.get_keepalive())
 
-    # command line argument contains Mosquitto MQTT broker IP address.
+    # Every controller except who publishes through the change suppressing publisher;
+    # who replies share diy/system/status with other devices so always go out.
+    # While the broker is away publishes are journaled and replayed on connect.
 
-    SWITCH.set_mqtt_topic(CLIENT, TOPIC.get_switch())
+    OUTBOX = OutboxModel(CONFIG.get_outbox()) if CONFIG.get_outbox() else None
+    PUBLISHER = PublishController(CLIENT, CONFIG.get_coalesce(), OUTBOX)
+    PUBLISHER.start(SCHEDULER)
 
-    # command line argument for the switch mode - motion activated is the default
+    # initilze the Who client for publishing.
 
-    CLIENT.connect(CONFIG.get_broker(), 1883, 60)
-    CLIENT.loop_start()
+    WHO.set_client(CLIENT)
+    SELFTEST.set_client(CLIENT, PUBLISHER)
 
-    time.sleep(2) # let MQTT stuff initialize
+    # Device state goes through the snapshot when one is published; it folds the
+    # status, switch and motion topics into diy/<host>/snapshot.
 
-    # initialize status monitoring
+    STATE = PUBLISHER
+    SNAPSHOT = None
+    if CONFIG.get_snapshot() != "off":
+        SNAPSHOT = SnapshotController(PUBLISHER, ZONES[0].topic.get_snapshot(),
+                                      CONFIG.get_snapshot(), CONFIG.get_snapshot_interval(),
+                                      CONFIG.get_legacy_topics())
+        STATE = SNAPSHOT
 
-    STATUS = StatusModel(CLIENT)
-    STATUS.start()
+    # command line argument contains Mosquitto MQTT broker IP address.
 
-    # start the switch automatic management
+    for zone in ZONES:
+        zone.switch.set_mqtt_topic(STATE, zone.topic.get_switch())
 
-    SWITCH.start()
+    # status monitoring and the switch timer start once the broker is connected
 
-    # Loop forever waiting for motion
+    STATUS = StatusModel(STATE, CONFIG.get_sample_interval())
+    if SNAPSHOT is not None:
+        track_snapshot()
 
-    while True:
-        time.sleep(0.5)
-        if MOTION.detected():
-            movement = MOTION.get_motion()
-            CLIENT.publish(TOPIC.get_motion(), movement, 0, True)
-            if movement == "1":
-                if CONFIG.get_mode() == "motion":
-                    SWITCH.turn_on_switch()
-                else:
-                    if SWITCH.state == "ON":
-                        SWITCH.turn_on_switch()
+    # Prometheus scrapes of the latency histograms when --metrics is given
+
+    METRICS = None
+    if CONFIG.get_metrics():
+        METRICS = metricsmodel.MetricsServer(CONFIG.get_metrics())
+        METRICS.start()
+
+    if CONFIG.get_runtime() == "asyncio":
+        run_asyncio()
+    else:
+        run_threads()
+
+    for zone in ZONES:
+        zone.motion.set_listener(None)
+        zone.motion.stop()
+    ALARM.reset()
+    STATUS.stop()
+    if SNAPSHOT is not None:
+        SNAPSHOT.stop()
+    if METRICS is not None:
+        METRICS.stop()
+    SCHEDULER.stop()
+    if STATE_FILE is not None:
+        STATE_FILE.close()
+    LOGGER.info('Application stopped')
+    LOG_PIPELINE.stop()
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+""" DIYHA alarm tests:
+    Cadence step timings against the simulated GPIO and the scheduler clock.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+os.environ.setdefault("DIYHA_GPIO", "simulated")
+
+# pylint: disable=wrong-import-position
+import queue
+import unittest
+
+from pkg_classes.alarmcontroller import AlarmController
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.schedulercontroller import SchedulerController
+
+ALARM_PIN = 931 # simulated pins are only dictionary keys
+PATTERN = (0.02, 0.02, 0.02, 0.02, 0.02, 0.06) # temporal-3 shape, 25 times faster
+CYCLES = 4
+JITTER = 0.015 # seconds a step may land from its ideal time
+
+
+class AlarmCadenceTest(unittest.TestCase):
+    """ AlarmController.play on the timer thread. """
+
+    def setUp(self, ):
+        """ An alarm on its own pin with the monotonic deadline scheduler. """
+        self.scheduler = SchedulerController()
+        self.scheduler.start()
+        self.alarm = AlarmController(ALARM_PIN)
+        self.alarm.start(self.scheduler)
+        self.stamps = queue.Queue()
+        GPIO.watch(ALARM_PIN, lambda pin, value, stamp: self.stamps.put((value, stamp)))
+
+    def tearDown(self, ):
+        """ Silence the alarm and stop the timers. """
+        self.alarm.silence()
+        self.scheduler.stop()
+
+    def test_jitter(self, ):
+        """ Every step lands within JITTER of its ideal time from the first pulse,
+            so the cadence does not drift, and pin levels alternate from on.
+        """
+        self.alarm.play(PATTERN)
+        level, first = self.stamps.get(True, 1.0)
+        self.assertEqual(level, GPIO.HIGH)
+        expected = first
+        for step in range(CYCLES * len(PATTERN)):
+            expected += PATTERN[step % len(PATTERN)]
+            level, stamp = self.stamps.get(True, 1.0)
+            self.assertEqual(level, GPIO.LOW if step % 2 == 0 else GPIO.HIGH)
+            self.assertLess(abs(stamp - expected), JITTER, "step " + str(step))
+
+
+if __name__ == '__main__':
+    unittest.main()
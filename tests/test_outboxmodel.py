@@ -0,0 +1,71 @@
+#!/usr/bin/python3
+""" DIYHA outbox tests:
+    Journal contents a restarted process replays.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import tempfile
+import unittest
+
+from pkg_classes.outboxmodel import OutboxModel
+
+
+class OutboxModelTest(unittest.TestCase):
+    """ Reload a journal left by a previous OutboxModel. """
+
+    def setUp(self, ):
+        """ A journal in a fresh directory. """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "outbox.journal")
+
+    def tearDown(self, ):
+        """ Remove the journal. """
+        self.directory.cleanup()
+
+    def test_reload(self, ):
+        """ Unretained publishes replay in order, retained ones collapse. """
+        outbox = OutboxModel(self.path)
+        outbox.append("diy/a/motion", "1", 0, True)
+        outbox.append("diy/events", "first", 0, False)
+        outbox.append("diy/a/motion", "0", 0, True)
+        outbox.append("diy/events", b'\xff', 0, False)
+        reloaded = OutboxModel(self.path)
+        self.assertEqual([event[1:] for event in reloaded.take(10)],
+                         [["diy/events", "first", 0, False],
+                          ["diy/a/motion", "0", 0, True],
+                          ["diy/events", b'\xff', 0, False]])
+
+    def test_discard_survives_restart(self, ):
+        """ A retained publish superseded by a live one is not replayed later. """
+        outbox = OutboxModel(self.path)
+        outbox.append("diy/a/motion", "1", 0, True)
+        outbox.append("diy/b/motion", "1", 0, True)
+        outbox.discard("diy/a/motion")
+        reloaded = OutboxModel(self.path)
+        self.assertEqual([event[1] for event in reloaded.take(10)], ["diy/b/motion"])
+
+
+if __name__ == '__main__':
+    unittest.main()
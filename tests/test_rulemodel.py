@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+""" DIYHA rule tests:
+    Rule sets that must be rejected before any trigger is routed or subscribed.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import unittest
+
+from pkg_classes.rulemodel import RuleModel
+
+
+class RuleModelTest(unittest.TestCase):
+    """ RuleModel.load keeps the old rules when any rule is bad. """
+
+    def setUp(self, ):
+        """ One good rule loaded. """
+        self.rules = RuleModel()
+        self.assertTrue(self.rules.load('[{"on": "diy/main/door", "after": "23:59", "for": 5}]'))
+
+    def test_rejected(self, ):
+        """ Every bad rule set is refused and the topics stay as they were. """
+        for payload in ('[{"on": "", "action": "on"}]', '[{"on": 5}]', '[{"on": "$SYS/load"}]',
+                        '[{"on": "diy/+/door"}]', '[{"for": -1}]', '[{"after": "12:99"}]',
+                        '[{"before": "24:00"}]', '[{"action": "toggle"}]'):
+            self.assertFalse(self.rules.load(payload), payload)
+            self.assertEqual(self.rules.get_topics(), {"diy/main/door"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+""" DIYHA scheduler tests:
+    Deadlines set from other threads under the asyncio runtime.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+os.environ.setdefault("DIYHA_GPIO", "simulated")
+
+# pylint: disable=wrong-import-position
+import asyncio
+import threading
+import unittest
+
+from pkg_classes.gpiobackend import GPIO
+from pkg_classes.motioncontroller import MotionController
+from pkg_classes.schedulercontroller import AsyncSchedulerController
+
+PIR_PIN = 901 # simulated pins are only dictionary keys
+RISE_HOLD = 0.05
+
+
+class AsyncSchedulerTest(unittest.TestCase):
+    """ Off-loop callers of AsyncSchedulerController. """
+
+    def setUp(self, ):
+        """ A debug loop, which raises on non thread-safe loop calls. """
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_debug(True)
+        self.scheduler = AsyncSchedulerController(self.loop)
+
+    def tearDown(self, ):
+        """ Close the loop. """
+        self.loop.close()
+
+    def run_loop(self, seconds):
+        """ Run the idle loop for seconds. """
+        self.loop.run_until_complete(asyncio.sleep(seconds))
+
+    def test_call_later_from_thread(self, ):
+        """ A deadline set from another thread fires on time on the loop thread. """
+        fired = []
+        def callback():
+            fired.append((self.loop.time(), threading.get_ident()))
+        def schedule():
+            self.set_at = self.loop.time()
+            self.scheduler.call_later(0.05, callback)
+        threading.Timer(0.1, schedule).start()
+        self.run_loop(1.0)
+        self.assertEqual(len(fired), 1)
+        self.assertLess(fired[0][0] - self.set_at, 0.3)
+        self.assertEqual(fired[0][1], threading.get_ident())
+
+    def test_cancel_from_thread(self, ):
+        """ A deadline cancelled from another thread never runs. """
+        fired = []
+        handle = self.scheduler.call_later(0.2, fired.append, True)
+        threading.Timer(0.05, self.scheduler.cancel, (handle,)).start()
+        self.run_loop(0.5)
+        self.assertEqual(fired, [])
+
+    def test_held_motion_from_gpio_thread(self, ):
+        """ PIR edges arrive on the GPIO callback thread; the rise_hold deadline
+            they set must still wake the idle loop.
+        """
+        motion = MotionController(PIR_PIN, RISE_HOLD)
+        motion.start(self.scheduler)
+        readings = []
+        motion.set_listener(lambda: readings.append(self.loop.time()))
+        def edge():
+            self.edge_at = self.loop.time()
+            GPIO.inject_edge(PIR_PIN, GPIO.HIGH)
+        threading.Timer(0.1, edge).start()
+        self.run_loop(1.0)
+        motion.stop()
+        self.assertEqual(len(readings), 1)
+        self.assertLess(readings[0] - self.edge_at, RISE_HOLD + 0.25)
+        self.assertEqual(motion.get_motion(), "1")
+
+
+if __name__ == '__main__':
+    unittest.main()
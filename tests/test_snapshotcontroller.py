@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+""" DIYHA snapshot tests:
+    CBOR float encoding across the float32 range.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import math
+import struct
+import unittest
+
+from pkg_classes.snapshotcontroller import cbor_dumps
+
+
+class CborFloatTest(unittest.TestCase):
+    """ float32 when exact, otherwise float64, never an exception. """
+
+    def test_single(self, ):
+        """ Exact float32 values and infinity take five bytes. """
+        self.assertEqual(cbor_dumps(1.5), b'\xfa' + struct.pack('>f', 1.5))
+        self.assertEqual(cbor_dumps(math.inf), b'\xfa' + struct.pack('>f', math.inf))
+
+    def test_double(self, ):
+        """ Inexact, out of float32 range and NaN values take nine bytes. """
+        for value in (0.1, 1e39, -3.5e38):
+            self.assertEqual(cbor_dumps(value), b'\xfb' + struct.pack('>d', value))
+        encoded = cbor_dumps(math.nan)
+        self.assertEqual(encoded[0], 0xfb)
+        self.assertTrue(math.isnan(struct.unpack('>d', encoded[1:])[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+""" DIYHA topic router tests:
+    A failing handler must not escape into the paho network thread.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import unittest
+
+from pkg_classes.loopbackbroker import LoopbackMessage
+from pkg_classes.topicrouter import TopicRouter, HANDLER_ERRORS
+
+
+class TopicRouterTest(unittest.TestCase):
+    """ TopicRouter.dispatch guards its handlers. """
+
+    def test_handler_error(self, ):
+        """ The error is logged and counted and later messages are still routed. """
+        handled = []
+        router = TopicRouter()
+        router.add("diy/main/room/motion/query", lambda client, msg: msg.payload["reply"])
+        router.add("diy/system/fire", lambda client, msg: handled.append(msg.payload))
+        errors = HANDLER_ERRORS.count
+        with self.assertLogs("pkg_classes.topicrouter", logging.ERROR):
+            router.dispatch(None, LoopbackMessage("diy/main/room/motion/query", "{}", 1, False))
+        router.dispatch(None, LoopbackMessage("diy/system/fire", "ON", 1, False))
+        self.assertEqual(HANDLER_ERRORS.count, errors + 1)
+        self.assertEqual(handled, [b'ON'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+""" DIYHA zone dispatch tests:
+    Motion readings drive the zone switch by its rules, or else its mode.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+os.environ.setdefault("DIYHA_GPIO", "simulated")
+
+# pylint: disable=wrong-import-position
+import unittest
+
+from pkg_classes.schedulercontroller import SchedulerController
+from pkg_classes.zonedispatch import motion_message
+from pkg_classes.zonemodel import ZoneModel
+
+
+class Recorder:
+    """ paho compatible publish() that keeps what it is given. """
+
+    def __init__(self, ):
+        """ Nothing published yet. """
+        self.published = []
+
+    def publish(self, topic, payload=None, qos=0, retain=False):
+        """ Keep the publish. """
+        self.published.append((topic, payload, qos, retain))
+
+
+class ZoneDispatchTest(unittest.TestCase):
+    """ motion_message against a simulated zone. """
+
+    def setUp(self, ):
+        """ A zone in motion mode with its relay off. """
+        self.scheduler = SchedulerController()
+        self.scheduler.start()
+        self.publisher = Recorder()
+        self.zone = ZoneModel("diy/test/room", 921, 922, 'motion', 300.0)
+        self.zone.switch.set_mqtt_topic(self.publisher, self.zone.topic.get_switch())
+        self.zone.switch.start(self.scheduler)
+
+    def tearDown(self, ):
+        """ Release the PIR and stop the timers. """
+        self.zone.motion.stop()
+        self.scheduler.stop()
+
+    def test_mode(self, ):
+        """ Without rules motion turns the switch on and is published retained. """
+        motion_message(self.zone, "1", self.publisher)
+        self.assertEqual(self.zone.switch.state, "ON")
+        self.assertIn((self.zone.topic.get_motion(), "1", 0, True), self.publisher.published)
+
+    def test_rule_off(self, ):
+        """ A matching rule with action off turns the switch off. """
+        self.zone.switch.turn_on_switch()
+        self.assertTrue(self.zone.rules.load('[{"on": "motion", "action": "off"}]'))
+        motion_message(self.zone, "1", self.publisher)
+        self.assertEqual(self.zone.switch.state, "OFF")
+
+
+if __name__ == '__main__':
+    unittest.main()
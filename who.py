@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+""" DIYHA fleet inventory:
+    Ask every device on the broker who it is and print the replies as JSON.
+"""
+
+# The MIT License (MIT)
+#
+# Copyright (c) 2020 parttimehacker@gmail.com
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import argparse
+import json
+import threading
+import paho.mqtt.client as mqtt
+
+from pkg_classes.whoaggregator import WhoAggregator
+from pkg_classes.whocontroller import WHO_SPREAD
+
+
+def main():
+    """ Connect, collect and print the inventory. """
+    parser = argparse.ArgumentParser('who.py')
+    parser.add_argument('--mqtt', required=True, help='MQTT server host[:port]')
+    parser.add_argument('--timeout', type=float, default=WHO_SPREAD + 2.0,
+                        help='Seconds to wait for replies, longer than the device --who-spread')
+    parser.add_argument('--expect', type=int, default=0,
+                        help='Stop as soon as this many devices replied')
+    args = parser.parse_args()
+    host, _, port = args.mqtt.partition(':')
+    connected = threading.Event()
+    client = mqtt.Client()
+    client.on_connect = lambda client, userdata, flags, rc: connected.set()
+    client.connect(host, int(port) if port else 1883, 60)
+    client.loop_start()
+    connected.wait(args.timeout)
+    aggregator = WhoAggregator(client, args.timeout, args.expect)
+    inventory = aggregator.collect()
+    client.disconnect()
+    client.loop_stop()
+    print(json.dumps(inventory, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    main()